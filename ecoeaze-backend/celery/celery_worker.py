@@ -1,11 +1,13 @@
 # celery/celery_worker.py
 import os
 import sys
-from celery import Celery
+from celery import Celery, maybe_patch_concurrency
 from dotenv import load_dotenv
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# ...and this directory, so celeryconfig resolves from any working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 load_dotenv()
 
@@ -17,6 +19,8 @@ celery_app = Celery(
     broker=BROKER_URL,
     backend=RESULT_BACKEND,
 )
+# Queues, routes, serialization and the beat schedule
+celery_app.config_from_object("celeryconfig")
 
 # Tell Celery where to find tasks
 celery_app.autodiscover_tasks(
@@ -28,7 +32,46 @@ celery_app.autodiscover_tasks(
     ]
 )
 
+# Worker profiles, one per queue in celeryconfig.task_queues:
+#   cpu:           prefork, one process per core, prefetch 1 so long image
+#                  jobs don't hold back queued work another process could start
+#   transactional, interactive, bulk:
+#                  threads (or gevent greenlets) for tasks that mostly wait on
+#                  SMTP/HTTP/Redis. Each lane has its own concurrency cap;
+#                  bulk is kept small so fan-outs can't exhaust SMTP/Redis
+#                  capacity the other lanes need. These keep the default
+#                  prefetch: non-prefork pools only ack between 2s broker
+#                  polls, so a prefetch of 1 throttles them once a backlog forms.
+CPU_CONCURRENCY = int(os.getenv("CELERY_CPU_CONCURRENCY", os.cpu_count() or 2))
+IO_POOL = os.getenv("CELERY_IO_POOL", "threads")
+TRANSACTIONAL_CONCURRENCY = int(os.getenv("CELERY_TRANSACTIONAL_CONCURRENCY", 10))
+INTERACTIVE_CONCURRENCY = int(os.getenv("CELERY_INTERACTIVE_CONCURRENCY", 50))
+BULK_CONCURRENCY = int(os.getenv("CELERY_BULK_CONCURRENCY", 4))
+
+WORKER_PROFILES = {
+    "cpu": ["-Q", "cpu", "-P", "prefork", "-c", str(CPU_CONCURRENCY), "--prefetch-multiplier", "1"],
+    "transactional": ["-Q", "transactional", "-P", IO_POOL, "-c", str(TRANSACTIONAL_CONCURRENCY)],
+    # Also drains celeryconfig.LEGACY_DEFAULT_QUEUE, where unrouted producers publish
+    "interactive": ["-Q", "interactive,celery", "-P", IO_POOL, "-c", str(INTERACTIVE_CONCURRENCY)],
+    "bulk": ["-Q", "bulk", "-P", IO_POOL, "-c", str(BULK_CONCURRENCY)],
+    # Single worker consuming every queue, for local development (no lane isolation)
+    "all": [],
+}
+
+
+def worker_argv(profile: str) -> list:
+    argv = ["worker", "-l", "info", *WORKER_PROFILES[profile]]
+    if profile != "all":
+        argv += ["-n", f"{profile}@%h"]
+    return argv
+
 
 if __name__ == "__main__":
-    # Run worker with: python celery_worker.py
-    celery_app.worker_main(["worker", "-l", "info"])
\ No newline at end of file
+    # Run worker with: python celery_worker.py [cpu|transactional|interactive|bulk|all]
+    profile = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if profile not in WORKER_PROFILES:
+        sys.exit(f"Unknown worker profile {profile!r}; expected one of {', '.join(WORKER_PROFILES)}")
+    argv = worker_argv(profile)
+    # gevent/eventlet must monkey-patch before any sockets are opened
+    maybe_patch_concurrency(argv)
+    celery_app.worker_main(argv)
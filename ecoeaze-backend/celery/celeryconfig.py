@@ -2,6 +2,7 @@
 import os
 from dotenv import load_dotenv
 from celery.schedules import crontab
+from kombu import Exchange, Queue
 
 load_dotenv()
 
@@ -17,6 +18,75 @@ accept_content = ["json"]
 timezone = "UTC"
 enable_utc = True
 
+# Queues: CPU-bound work runs on a prefork worker sized to the cores. I/O-bound
+# work (SMTP, SMS, push, HTTP, Redis bookkeeping) runs on threads/gevent
+# workers, split into priority lanes that each get their own worker and
+# concurrency cap, so an OTP email never queues behind a bulk send:
+#   transactional  user is waiting on it (OTP, order confirmation)
+#   interactive    request-driven updates and reads; the default
+#   bulk           fan-outs, batch imports and maintenance sweeps
+# See celery_worker.py for the matching worker profiles.
+CPU_QUEUE = "cpu"
+TRANSACTIONAL_QUEUE = "transactional"
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+# Celery's stock default queue. Producers without these routes (the HTTP
+# enqueue bridge, older deploys, messages queued before the lanes existed)
+# still publish here, so the interactive lane consumes it too.
+LEGACY_DEFAULT_QUEUE = "celery"
+
+task_queues = tuple(
+    Queue(name, Exchange(name), routing_key=name)
+    for name in (CPU_QUEUE, TRANSACTIONAL_QUEUE, INTERACTIVE_QUEUE, BULK_QUEUE, LEGACY_DEFAULT_QUEUE)
+)
+# Anything not routed below is assumed to be interactive I/O
+task_default_queue = INTERACTIVE_QUEUE
+task_default_exchange = INTERACTIVE_QUEUE
+task_default_routing_key = INTERACTIVE_QUEUE
+
+CPU_TASKS = (
+    # Image decoding/encoding
+    "optimize_product_image",
+    "generate_image_thumbnails",
+    "watermark_product_images",
+    "analyze_image_quality",
+    "analyze_image_quality_batch",
+    # Analytics aggregation and forecasting. generate_profit_loss_report is
+    # not here: it mostly waits on the paginated orders API, so it stays on
+    # the interactive threads lane.
+    "generate_user_engagement_report",
+    "generate_inventory_report",
+    "predict_demand",
+    "predict_demand_batch",
+)
+
+TRANSACTIONAL_TASKS = (
+    "send_otp_email",
+    "send_order_confirmation",
+    "send_welcome_email",
+    "send_email",
+    "send_sms",
+)
+
+BULK_TASKS = (
+    "send_bulk_notification",
+    "deliver_notification_chunk",
+    "send_email_batch",
+    "track_user_behavior_batch",
+    "migrate_behavior_storage",
+    "backfill_sales_rollups",
+    "backfill_all_sales_rollups",
+    "bulk_update_inventory_cache",
+    "check_low_stock_periodic",
+    "cleanup_old_images",
+)
+
+task_routes = {
+    **{name: {"queue": CPU_QUEUE} for name in CPU_TASKS},
+    **{name: {"queue": TRANSACTIONAL_QUEUE} for name in TRANSACTIONAL_TASKS},
+    **{name: {"queue": BULK_QUEUE} for name in BULK_TASKS},
+}
+
 # Example beat schedule (if you use celery beat)
 beat_schedule = {
     "update-analytics-cache-every-30-minutes": {
@@ -27,6 +97,10 @@ beat_schedule = {
         "task": "check_low_stock_periodic",
         "schedule": crontab(minute=0, hour="*"),
     },
+    "backfill-sales-rollups-daily": {
+        "task": "backfill_all_sales_rollups",
+        "schedule": crontab(hour=1, minute=30),
+    },
     "cleanup-old-images-daily": {
         "task": "cleanup_old_images",
         "schedule": crontab(hour=2, minute=0),  # Run at 2 AM daily
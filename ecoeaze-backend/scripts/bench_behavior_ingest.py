@@ -0,0 +1,81 @@
+"""
+Throughput comparison: per-event track_user_behavior vs track_user_behavior_batch.
+
+Runs the task bodies in-process against the Redis configured in .env
+(REDIS_HOST / REDIS_PORT, analytics db 3) and checks that both paths leave
+identical behavior histories, as returned by read_user_behaviors. Broker and
+task-dispatch overhead is not included, so the real per-event cost in
+production is higher than shown.
+
+Usage:
+    python scripts/bench_behavior_ingest.py --events 20000 --users 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.tasks.analyticsTasks import read_user_behaviors, track_user_behavior, track_user_behavior_batch
+from src.tasks.redisPool import redis_manager, ANALYTICS_DB
+
+
+def make_events(count: int, users: int, prefix: str):
+    start = datetime.utcnow() - timedelta(hours=1)
+    actions = ["product_view", "add_to_cart", "search", "checkout"]
+    return [
+        {
+            "user_id": f"{prefix}{random.randrange(users)}",
+            "action": random.choice(actions),
+            "metadata": {"productId": f"prod{random.randrange(5000)}"},
+            "timestamp": (start + timedelta(milliseconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def snapshot(client, prefix: str, users: int):
+    return [read_user_behaviors(f"{prefix}{n}", limit=None) for n in range(users)]
+
+
+def clear(client, prefix: str, users: int):
+    client.delete(*[f"user:{prefix}{n}:behaviors" for n in range(users)],
+                  *[f"user:{prefix}{n}:events" for n in range(users)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    client = redis_manager.client(ANALYTICS_DB)
+    prefix = f"bench{os.getpid()}_"
+    events = make_events(args.events, args.users, prefix)
+
+    clear(client, prefix, args.users)
+    started = time.perf_counter()
+    for event in events:
+        track_user_behavior(event["user_id"], event["action"], event["metadata"], event["timestamp"])
+    single_seconds = time.perf_counter() - started
+    single_state = snapshot(client, prefix, args.users)
+
+    clear(client, prefix, args.users)
+    started = time.perf_counter()
+    track_user_behavior_batch(events)
+    batch_seconds = time.perf_counter() - started
+    batch_state = snapshot(client, prefix, args.users)
+    clear(client, prefix, args.users)
+
+    print(f"events: {args.events}, users: {args.users}")
+    print(f"track_user_behavior (per event): {single_seconds:.3f}s  {args.events / single_seconds:,.0f} events/s")
+    print(f"track_user_behavior_batch:       {batch_seconds:.3f}s  {args.events / batch_seconds:,.0f} events/s")
+    print(f"speedup: {single_seconds / batch_seconds:.1f}x")
+    print(f"identical results: {single_state == batch_state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Redis memory per behavior event: legacy JSON sorted sets vs behavior streams.
+
+Writes the same synthetic events through track_user_behavior_batch once with
+BEHAVIOR_STORAGE=zset and once with the stream layout, against the Redis
+configured in .env (REDIS_HOST / REDIS_PORT, analytics db 3), and reports
+MEMORY USAGE summed over the per-user keys. Needs a real Redis (MEMORY USAGE
+is not emulated by fakeredis). The keys are deleted afterwards.
+
+Usage:
+    python scripts/bench_behavior_memory.py --users 200 --events-per-user 1000
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.tasks import analyticsTasks
+from src.tasks.redisPool import redis_manager, ANALYTICS_DB
+
+
+def make_events(users: int, per_user: int, prefix: str):
+    start = datetime.utcnow() - timedelta(days=1)
+    actions = ["product_view", "add_to_cart", "search", "checkout"]
+    return [
+        {
+            "user_id": f"{prefix}{user}",
+            "action": random.choice(actions),
+            "metadata": {"productId": f"prod{random.randrange(5000)}"},
+            "timestamp": (start + timedelta(seconds=i * 7 + user)).isoformat(),
+        }
+        for i in range(per_user)
+        for user in range(users)
+    ]
+
+
+def measure(client, keys: list) -> int:
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+        return sum(size or 0 for size in pipe.execute())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--events-per-user", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = redis_manager.client(ANALYTICS_DB)
+    prefix = f"benchmem{os.getpid()}_"
+    events = make_events(args.users, args.events_per_user, prefix)
+    total = len(events)
+    results = {}
+
+    for storage, suffix in (("zset", "behaviors"), ("stream", "events")):
+        analyticsTasks.BEHAVIOR_STORAGE = storage
+        keys = [f"user:{prefix}{n}:{suffix}" for n in range(args.users)]
+        client.delete(*keys)
+        analyticsTasks.track_user_behavior_batch(events)
+        results[storage] = measure(client, keys)
+        client.delete(*keys)
+
+    print(f"users: {args.users}, events per user: {args.events_per_user} ({total} events)")
+    for storage, used in results.items():
+        print(f"{storage:<7} {used / 1024 / 1024:8.2f} MiB  {used / total:6.1f} bytes/event")
+    print(f"stream uses {results['stream'] / results['zset']:.0%} of the sorted-set memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+OTP enqueue-to-send latency while a bulk email job drains, with and without
+the priority lanes from celery/celeryconfig.py.
+
+Stand-in tasks named send_otp_email and send_email_batch sleep for
+--send-ms per message instead of talking to SMTP, and are routed by the real
+celeryconfig task_routes. Two setups with the same total thread count run
+in turn:
+
+  single queue: one worker consuming every task from one queue (the old setup)
+  lanes:        a transactional worker and a bulk worker with their own
+                concurrency caps, as started by `celery_worker.py <profile>`
+
+Workers run in this process on threads. The broker defaults to the in-memory
+transport, so nothing needs to be running. Pass --broker redis://... to go
+through a real Redis.
+
+Usage:
+    python scripts/bench_priority_lanes.py --bulk-messages 10000 --otps 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "celery"))
+
+from celery import Celery
+from celery.worker import WorkController
+
+import celeryconfig
+
+otp_latencies = []
+bulk_done = threading.Event()
+
+
+def make_app(broker: str, send_seconds: float, bulk_tasks: int, routed: bool) -> Celery:
+    app = Celery("bench_priority_lanes", broker=broker)
+    app.conf.update(task_ignore_result=True, worker_hijack_root_logger=False,
+                    broker_transport_options={"polling_interval": 0.01})
+    if routed:
+        app.conf.update(
+            task_queues=celeryconfig.task_queues,
+            task_routes=celeryconfig.task_routes,
+            task_default_queue=celeryconfig.task_default_queue,
+            task_default_exchange=celeryconfig.task_default_exchange,
+            task_default_routing_key=celeryconfig.task_default_routing_key,
+        )
+    else:
+        app.conf.update(task_default_queue="bench_single", task_default_exchange="bench_single",
+                        task_default_routing_key="bench_single")
+
+    # Pool threads look tasks up on the default app
+    app.set_default()
+
+    completed = {"bulk": 0}
+    lock = threading.Lock()
+
+    @app.task(name="send_otp_email", shared=False)
+    def send_otp_email(enqueued_at: float):
+        time.sleep(send_seconds)
+        otp_latencies.append(time.time() - enqueued_at)
+
+    @app.task(name="send_email_batch", shared=False)
+    def send_email_batch(count: int):
+        time.sleep(send_seconds * count)
+        with lock:
+            completed["bulk"] += 1
+            if completed["bulk"] == bulk_tasks:
+                bulk_done.set()
+
+    return app
+
+
+def start_worker(app: Celery, queues: list, concurrency: int) -> WorkController:
+    worker = WorkController(app=app, queues=queues, pool_cls="threads", concurrency=concurrency,
+                            loglevel="WARNING", without_heartbeat=True, without_mingle=True,
+                            without_gossip=True)
+    threading.Thread(target=worker.start, daemon=True).start()
+    return worker
+
+
+def run(label: str, args, routed: bool):
+    otp_latencies.clear()
+    bulk_done.clear()
+    bulk_tasks = -(-args.bulk_messages // args.chunk)
+    send_seconds = args.send_ms / 1000
+    app = make_app(args.broker, send_seconds, bulk_tasks, routed)
+
+    if routed:
+        workers = [
+            start_worker(app, [celeryconfig.TRANSACTIONAL_QUEUE], args.transactional_concurrency),
+            start_worker(app, [celeryconfig.BULK_QUEUE], args.bulk_concurrency),
+        ]
+    else:
+        workers = [start_worker(app, ["bench_single"], args.transactional_concurrency + args.bulk_concurrency)]
+
+    started = time.perf_counter()
+    for n in range(bulk_tasks):
+        count = min(args.chunk, args.bulk_messages - n * args.chunk)
+        app.send_task("send_email_batch", args=[count])
+    for _ in range(args.otps):
+        app.send_task("send_otp_email", args=[time.time()])
+        time.sleep(args.otp_interval_ms / 1000)
+
+    deadline = time.time() + args.timeout
+    while len(otp_latencies) < args.otps and time.time() < deadline:
+        time.sleep(0.05)
+    bulk_done.wait(max(0, deadline - time.time()))
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.stop(in_sighandler=False)
+
+    latencies = sorted(otp_latencies)
+    if not latencies:
+        print(f"{label:<14} no OTPs delivered within {args.timeout}s")
+        return
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<14} OTP latency p50 {statistics.median(latencies) * 1000:8.1f} ms  "
+          f"p99 {p99 * 1000:8.1f} ms  max {latencies[-1] * 1000:8.1f} ms  "
+          f"({len(latencies)}/{args.otps} sent)  bulk {'drained' if bulk_done.is_set() else 'unfinished'} "
+          f"after {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="memory://")
+    parser.add_argument("--bulk-messages", type=int, default=10000)
+    parser.add_argument("--chunk", type=int, default=100, help="messages per bulk task")
+    parser.add_argument("--send-ms", type=float, default=5.0, help="simulated SMTP time per message")
+    parser.add_argument("--otps", type=int, default=50)
+    parser.add_argument("--otp-interval-ms", type=float, default=100)
+    parser.add_argument("--transactional-concurrency", type=int, default=2)
+    parser.add_argument("--bulk-concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"bulk: {args.bulk_messages} messages in chunks of {args.chunk}, {args.send_ms} ms/message; "
+          f"{args.otps} OTPs every {args.otp_interval_ms} ms")
+    run("single queue", args, routed=False)
+    run("lanes", args, routed=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Compare the old single-download profit/loss order fetch with the paginated,
+filtered stream (_iter_farmer_orders) that the all-time profit/loss report
+and backfill_sales_rollups use. Fixed periods such as "monthly" are read
+from the sales rollups instead and don't touch the API.
+
+A stub /farmers/orders API is started in a subprocess on localhost. It serves
+every order when called without `limit` (what the old code received) and
+honours farmerId/from/to/page/limit otherwise. Peak memory (tracemalloc) and
+wall time are measured for the reporting side only.
+
+Usage:
+    python scripts/bench_profit_loss_fetch.py --orders 50000 --farmers 50
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_orders(count: int, farmers: int):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    orders = []
+    for n in range(count):
+        farmer_id = f"farmer{rng.randrange(farmers)}"
+        orders.append({
+            "_id": f"order{n}",
+            "farmerId": farmer_id,
+            "createdAt": (now - timedelta(minutes=rng.randrange(365 * 24 * 60))).isoformat(),
+            "user": {"name": "Customer", "email": "customer@example.com"},
+            "items": [
+                {"farmer": farmer_id, "name": f"Product {i}", "price": rng.randrange(20, 500), "quantity": rng.randrange(1, 10)}
+                for i in range(rng.randrange(1, 6))
+            ],
+        })
+    orders.sort(key=lambda order: order["createdAt"], reverse=True)
+    return orders
+
+
+def serve(port: int, count: int, farmers: int):
+    orders = make_orders(count, farmers)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            if "limit" not in query:
+                body = {"success": True, "data": orders}
+            else:
+                matching = [
+                    order for order in orders
+                    if order["farmerId"] == query.get("farmerId", order["farmerId"])
+                    and order["createdAt"] >= query.get("from", "")
+                    and order["createdAt"] <= query.get("to", "9999")
+                ]
+                limit = int(query["limit"])
+                start = (int(query.get("page", 1)) - 1) * limit
+                body = {
+                    "success": True,
+                    "data": matching[start:start + limit],
+                    "pagination": {"total": len(matching), "page": int(query.get("page", 1)), "limit": limit},
+                }
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def old_approach(base: str, farmer_id: str):
+    import requests
+
+    response = requests.get(f"{base}/farmers/orders", timeout=60)
+    response.raise_for_status()
+    orders = response.json().get("data", [])
+    farmer_orders = [order for order in orders if order.get("farmerId") == farmer_id]
+    total_revenue = 0
+    for order in farmer_orders:
+        for item in order.get("items", []):
+            total_revenue += item.get("price", 0) * item.get("quantity", 0)
+    return total_revenue, len(farmer_orders)
+
+
+def measure(label: str, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:7.3f}s  peak {peak / 1e6:8.2f} MB  result {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--farmers", type=int, default=50)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.orders, args.farmers)
+        return
+
+    base = f"http://127.0.0.1:{args.port}/api"
+    os.environ["ANALYTICS_API_BASE"] = base
+    server = subprocess.Popen([sys.executable, __file__, "--serve", "--port", str(args.port),
+                               "--orders", str(args.orders), "--farmers", str(args.farmers)])
+    try:
+        import requests
+
+        for _ in range(100):
+            try:
+                requests.get(f"{base}/farmers/orders?limit=1", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+
+        from src.tasks import analyticsTasks
+
+        now = datetime.utcnow()
+        print(f"orders: {args.orders}, farmers: {args.farmers}")
+        measure("old (all-time, one GET)", lambda: old_approach(base, "farmer0"))
+        measure("paginated (all-time)", lambda: analyticsTasks._aggregate_profit_loss(
+            analyticsTasks._iter_farmer_orders("farmer0"), "farmer0"))
+        measure("paginated (30-day backfill)", lambda: sum(
+            1 for _ in analyticsTasks._iter_farmer_orders("farmer0", since=now - timedelta(days=30))))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Check SmtpConnectionPool session reuse and failure handling against a local
+aiosmtpd server with AUTH (pip install aiosmtpd).
+
+Scenarios, each printing the pool's and the server's connection counts:
+  reuse:     20 single sends plus a batch of 10 share one session
+  rejected:  a refused recipient fails only its own message; the session is kept
+  restart:   the server restarts between sends; one reconnect
+  idle:      a session idle past idle_timeout is replaced
+  down:      an unreachable server fails the whole batch without retrying each message
+  bad auth:  refused login fails the whole batch
+
+Exits non-zero if any scenario deviates from the expected result.
+
+Usage:
+    python scripts/check_smtp_pool.py --port 8025
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from src.tasks.smtpPool import SmtpConnectionPool
+
+USERNAME, PASSWORD = "pool-check", "secret"
+server_connections = [0]
+
+
+class Handler:
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+class CountingController(Controller):
+    def factory(self):
+        server_connections[0] += 1
+        return super().factory()
+
+    def start(self):
+        # start() opens a probe connection of its own; don't count it
+        super().start()
+        server_connections[0] -= 1
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    # handled=False makes aiosmtpd answer a mismatch with 535 instead of staying silent
+    return AuthResult(success=auth_data.login == USERNAME.encode() and auth_data.password == PASSWORD.encode(),
+                      handled=False)
+
+
+def start_server(port: int) -> Controller:
+    controller = CountingController(Handler(), hostname="127.0.0.1", port=port, auth_require_tls=False,
+                                    authenticator=authenticate)
+    controller.start()
+    return controller
+
+
+def message(to: str) -> MIMEText:
+    msg = MIMEText("pool check")
+    msg["Subject"] = "pool check"
+    msg["From"] = "noreply@ecoeaze.test"
+    msg["To"] = to
+    return msg
+
+
+def main():
+    # aiosmtpd warns about its own Session.login_data on every AUTH
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(name: str, ok: bool, detail):
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<9} {detail}")
+        if not ok:
+            failures.append(name)
+
+    controller = start_server(args.port)
+    pool = SmtpConnectionPool("127.0.0.1", args.port, USERNAME, PASSWORD, starttls=False)
+
+    results = [pool.send(message(f"single{n}@ecoeaze.test")) for n in range(20)]
+    results += pool.send_many([message(f"batch{n}@ecoeaze.test") for n in range(10)])
+    check("reuse", all(results) and pool.stats["connections"] == 1 and server_connections[0] == 1,
+          f"{sum(results)}/30 sent, pool {pool.stats}, server connections {server_connections[0]}")
+
+    before = server_connections[0]
+    results = pool.send_many([message("first@ecoeaze.test"), message("refused@ecoeaze.test"),
+                              message("third@ecoeaze.test")])
+    check("rejected", results == [True, False, True] and server_connections[0] == before,
+          f"results {results}, new server connections {server_connections[0] - before}")
+
+    controller.stop()
+    controller = start_server(args.port)
+    reconnects = pool.stats["reconnects"]
+    sent = pool.send(message("restart@ecoeaze.test"))
+    check("restart", sent and pool.stats["reconnects"] == reconnects + 1,
+          f"sent {sent}, reconnects {pool.stats['reconnects'] - reconnects}")
+
+    pool.idle_timeout = 0.01
+    time.sleep(0.05)
+    connections = pool.stats["connections"]
+    sent = pool.send(message("idle@ecoeaze.test"))
+    check("idle", sent and pool.stats["connections"] == connections + 1,
+          f"sent {sent}, new sessions {pool.stats['connections'] - connections}")
+    pool.idle_timeout = 60
+    pool.close_all()
+
+    controller.stop()
+    started = time.perf_counter()
+    results = pool.send_many([message(f"down{n}@ecoeaze.test") for n in range(3)])
+    check("down", results == [False] * 3, f"results {results} in {time.perf_counter() - started:.2f}s")
+
+    controller = start_server(args.port)
+    bad_pool = SmtpConnectionPool("127.0.0.1", args.port, USERNAME, "wrong", starttls=False)
+    before = server_connections[0]
+    results = bad_pool.send_many([message(f"auth{n}@ecoeaze.test") for n in range(3)])
+    check("bad auth", results == [False] * 3 and server_connections[0] - before == 1,
+          f"results {results}, server connections {server_connections[0] - before}")
+    controller.stop()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,25 @@
 import Order from "../models/Order.js";
 import Product from "../models/Product.js";
 import User from "../models/User.js";
-import { sendOrderConfirmation, trackUserBehavior } from "../services/celeryService.js";
+import { sendOrderConfirmation, trackUserBehavior, ingestOrderEvents } from "../services/celeryService.js";
 import { sendOrderConfirmationEmail, sendDeliveryUpdateEmail } from "../services/emailService.js";
 import { recordSale, trackActiveUser } from "../services/redisService.js";
 
+/**
+ * The fields the sales rollups need from an order, with ids as strings
+ */
+const orderEvent = (order) => ({
+  _id: order._id.toString(),
+  createdAt: order.createdAt,
+  status: order.status,
+  items: order.items.map((item) => ({
+    product: (item.product?._id || item.product).toString(),
+    farmer: item.farmer.toString(),
+    price: item.price,
+    quantity: item.quantity,
+  })),
+});
+
 /**
  * POST /api/orders
  * Create a new order
@@ -77,6 +92,11 @@ export const createOrder = async (req, res, next) => {
 
     await order.save();
 
+    // Add the order to the sales rollups
+    ingestOrderEvents([orderEvent(order)]).catch(err => {
+      console.error("Failed to queue order for sales rollups:", err);
+    });
+
     // Populate user and product details for response
     await order.populate([
       { path: "user", select: "name email" },
@@ -165,22 +185,51 @@ export const getMyOrders = async (req, res, next) => {
 /**
  * GET /api/farmers/orders
  * Get all orders containing products from the logged-in farmer
+ * Query (optional): from, to (createdAt range), page, limit
+ * Admins (e.g. the analytics worker) pass farmerId to pick the farmer.
+ * Without limit every matching order is returned.
  */
 export const getFarmerOrders = async (req, res, next) => {
   try {
-    const farmerId = req.user.id;
+    const { from, to, page = 1, limit } = req.query;
+    const farmerId =
+      req.user.role === "admin" && req.query.farmerId ? req.query.farmerId : req.user.id;
 
     // Find orders that contain products from this farmer
-    const orders = await Order.find({
-      "items.farmer": farmerId,
-    })
+    const query = { "items.farmer": farmerId };
+    if (from || to) {
+      query.createdAt = {};
+      if (from) query.createdAt.$gte = new Date(from);
+      if (to) query.createdAt.$lte = new Date(to);
+    }
+
+    const ordersQuery = Order.find(query)
       .populate("user", "name email")
       .populate("items.product", "name price")
       .sort({ createdAt: -1 });
 
+    if (!limit) {
+      const orders = await ordersQuery;
+      return res.json({
+        success: true,
+        data: orders,
+      });
+    }
+
+    const skip = (Number(page) - 1) * Number(limit);
+    const [orders, total] = await Promise.all([
+      ordersQuery.skip(skip).limit(Number(limit)),
+      Order.countDocuments(query),
+    ]);
+
     return res.json({
       success: true,
       data: orders,
+      pagination: {
+        total,
+        page: Number(page),
+        limit: Number(limit),
+      },
     });
   } catch (err) {
     next(err);
@@ -246,6 +295,11 @@ export const updateOrderStatus = async (req, res, next) => {
     order.status = status;
     await order.save();
 
+    // Update the sales rollups (a cancellation takes the order back out)
+    ingestOrderEvents([orderEvent(order)]).catch(err => {
+      console.error("Failed to queue order for sales rollups:", err);
+    });
+
     // Populate for response
     await order.populate([
       { path: "user", select: "name email" },
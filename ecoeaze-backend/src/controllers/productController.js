@@ -1,6 +1,7 @@
 // src/controllers/productController.js
 import Product from "../models/Product.js";
 import cloudinary from "../config/cloudinary.js";
+import { removeProductInventory } from "../services/celeryService.js";
 
 /**
  * GET /api/products
@@ -307,6 +308,11 @@ export const deleteProduct = async (req, res, next) => {
 
     await product.deleteOne();
 
+    // Stop low-stock alerts and inventory reports for the deleted product
+    removeProductInventory(product._id.toString()).catch(err => {
+      console.error("Failed to remove product inventory:", err);
+    });
+
     return res.json({
       success: true,
       message: "Product deleted",
@@ -1,6 +1,22 @@
 // src/middleware/authMiddleware.js
+import crypto from "crypto";
 import jwt from "jsonwebtoken";
 
+/**
+ * Service credential for the Python task workers (ANALYTICS_API_TOKEN).
+ * A matching Bearer token authenticates as an admin, so workers can read
+ * /admin/stats and any farmer's /farmers/orders. Disabled when unset.
+ */
+const SERVICE_USER = { id: "analytics-service", role: "admin", email: null };
+
+const isServiceToken = (token) => {
+  const expected = process.env.ANALYTICS_API_TOKEN;
+  if (!expected || !token) return false;
+  const given = Buffer.from(token);
+  const wanted = Buffer.from(expected);
+  return given.length === wanted.length && crypto.timingSafeEqual(given, wanted);
+};
+
 /**
  * Require a valid JWT access token.
  * Reads from:
@@ -29,6 +45,12 @@ export const requireAuth = (req, res, next) => {
       });
     }
 
+    // 3) Service credential (Authorization header only)
+    if (authHeader.startsWith("Bearer ") && isServiceToken(authHeader.split(" ")[1])) {
+      req.user = { ...SERVICE_USER };
+      return next();
+    }
+
     // Verify token
     const payload = jwt.verify(token, process.env.JWT_ACCESS_SECRET);
 
@@ -1,7 +1,7 @@
 // src/routes/farmerRoutes.js
 import express from "express";
 import multer from "multer";
-import { requireAuth } from "../middleware/authMiddleware.js";
+import { requireAuth, requireRole } from "../middleware/authMiddleware.js";
 import { requireFarmer } from "../middleware/farmerMiddleware.js";
 import { 
   createFarmerProduct, 
@@ -48,11 +48,11 @@ router.delete(
   deleteFarmerProduct
 );
 
-// Farmer orders (notification list)
+// Farmer orders (notification list); admins may pass ?farmerId=
 router.get(
   "/orders",
   requireAuth,
-  requireFarmer,
+  requireRole("farmer", "admin"),
   getFarmerOrders
 );
 
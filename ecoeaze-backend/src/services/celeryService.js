@@ -114,6 +114,14 @@ export const trackUserBehavior = async (userId, action, metadata = {}) => {
   return await enqueueCeleryTask('track_user_behavior', [userId, action, metadata]);
 };
 
+/**
+ * Fold orders into the sales rollups (created orders and status changes;
+ * cancelled orders are taken back out)
+ */
+export const ingestOrderEvents = async (orders) => {
+  return await enqueueCeleryTask('ingest_order_events', [orders]);
+};
+
 /**
  * Auto reorder stock when low
  */
@@ -128,6 +136,13 @@ export const updateInventoryCache = async (productId, newQuantity) => {
   return await enqueueCeleryTask('update_inventory_cache', [productId, newQuantity]);
 };
 
+/**
+ * Remove a deleted product from the inventory caches and low-stock index
+ */
+export const removeProductInventory = async (productId) => {
+  return await enqueueCeleryTask('remove_product_inventory', [productId]);
+};
+
 /**
  * Generate inventory report
  */
@@ -157,8 +172,10 @@ export default {
   sendPushNotification,
   generateProfitLossReport,
   trackUserBehavior,
+  ingestOrderEvents,
   autoReorderStock,
   updateInventoryCache,
+  removeProductInventory,
   generateInventoryReport,
   optimizeProductImage,
   generateImageThumbnails
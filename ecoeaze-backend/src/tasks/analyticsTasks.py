@@ -2,11 +2,15 @@
 import os
 import json
 import csv
-from datetime import datetime, timedelta
+from collections import defaultdict
+import time
+from datetime import datetime, timedelta, timezone
 from celery import Celery
 from dotenv import load_dotenv
-import requests
-import redis
+from src.tasks.celeryConfig import configure_app
+from src.tasks.httpClient import HttpClient
+from src.tasks.redisPool import redis_manager, ANALYTICS_DB
+from src.tasks import salesRollups
 
 load_dotenv()
 
@@ -15,16 +19,19 @@ app = Celery(
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
 )
+configure_app(app)
 
 ANALYTICS_API_BASE = os.getenv("ANALYTICS_API_BASE", "http://localhost:5008/api")
+# Service credential for the backend API; the Node API treats it as an admin
+ANALYTICS_API_TOKEN = os.getenv("ANALYTICS_API_TOKEN")
+# Platform stats are reused for 5 minutes, then revalidated with the API's ETag
+STATS_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_STATS_CACHE_TTL", 300))
 
-# Initialize Redis client for caching analytics data
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=3,  # Use database 3 for analytics
-    decode_responses=True
-)
+# Shared keep-alive client for the backend API
+analytics_api = HttpClient(ANALYTICS_API_BASE, token=ANALYTICS_API_TOKEN)
+
+# Shared pooled Redis client for caching analytics data
+redis_client = redis_manager.client(ANALYTICS_DB)
 
 @app.task(name="generate_sales_report")
 def generate_sales_report(farmerId: str, range: str = "7d"):
@@ -37,13 +44,19 @@ def generate_sales_report(farmerId: str, range: str = "7d"):
     """
     # Example: call your backend analytics API (you can change the URL)
     try:
-        url = f"{ANALYTICS_API_BASE}/admin/stats"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        stats = response.json()
+        stats = analytics_api.get_json("/admin/stats", cache_ttl=STATS_CACHE_TTL_SECONDS)
     except Exception as e:
         return {"success": False, "message": f"Failed to fetch stats: {e}"}
 
+    # The farmer's own sales come from the daily rollups
+    days = _period_days(range) or 7
+    start_date = datetime.utcnow().date() - timedelta(days=days - 1)
+    try:
+        _ensure_farmer_rollups(farmerId)
+        sales = salesRollups.sales_summary("farmer", farmerId, start_date, days)
+    except Exception as e:
+        return {"success": False, "message": f"Failed to load sales rollups: {e}"}
+
     # Save a JSON report to disk (simple example)
     reports_dir = os.getenv("REPORTS_DIR", "reports")
     os.makedirs(reports_dir, exist_ok=True)
@@ -59,6 +72,7 @@ def generate_sales_report(farmerId: str, range: str = "7d"):
             "range": range,
             "generatedAt": datetime.utcnow().isoformat(),
             "stats": stats,
+            "sales": sales,
           },
           f,
           indent=2,
@@ -70,68 +84,548 @@ def generate_sales_report(farmerId: str, range: str = "7d"):
     }
 
 
-@app.task(name="track_user_behavior")
-def track_user_behavior(user_id: str, action: str, metadata: dict = None):
+BEHAVIOR_HISTORY_LIMIT = 1000  # Keep only the last 1000 behaviors per user
+BEHAVIOR_TTL_SECONDS = 90 * 24 * 60 * 60  # Expire after 90 days
+BEHAVIOR_BATCH_USERS_PER_PIPELINE = 500
+# "stream" (user:{id}:events) or the legacy JSON sorted set, "zset" (user:{id}:behaviors)
+BEHAVIOR_STORAGE = os.getenv("BEHAVIOR_STORAGE", "stream")
+
+
+def _parse_timestamp(timestamp=None):
     """
-    Track user behavior for analytics and personalization.
+    Naive UTC datetime for an ISO string, a UTC epoch or None ("now").
     """
+    if timestamp is None:
+        return datetime.utcnow()
+    if isinstance(timestamp, (int, float)):
+        return datetime.utcfromtimestamp(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _epoch_ms(timestamp: datetime) -> int:
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _behavior_entry(user_id: str, action: str, metadata: dict = None, timestamp=None):
+    """
+    Build the (member, score) pair stored in user:{user_id}:behaviors.
+    timestamp may be an ISO string, a UTC epoch or None for "now".
+    """
+    timestamp = _parse_timestamp(timestamp)
     behavior_data = {
         "user_id": user_id,
         "action": action,
         "metadata": metadata or {},
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": timestamp.isoformat()
     }
-    
-    # Store in Redis sorted set for quick access
+    return json.dumps(behavior_data), timestamp.timestamp()
+
+
+def _queue_behavior_writes(pipe, user_id: str, members: dict):
+    """
+    Queue ZADD + trim + expire for one user's behaviors on a pipeline.
+    """
     key = f"user:{user_id}:behaviors"
-    score = datetime.utcnow().timestamp()
-    redis_client.zadd(key, {json.dumps(behavior_data): score})
+    pipe.zadd(key, members)
+    pipe.zremrangebyrank(key, 0, -(BEHAVIOR_HISTORY_LIMIT + 1))
+    pipe.expire(key, BEHAVIOR_TTL_SECONDS)
+
+
+# --- Behavior streams ---------------------------------------------------------
+#
+# user:{user_id}:events is a Redis Stream with one entry per behavior:
+#   a  action
+#   m  metadata as compact JSON, "" when empty
+# Entry ids are {event time in epoch ms}-{seq}, so the stream is in event-time
+# order and XREVRANGE COUNT / MAXLEN ~ keep the newest events. The user id is
+# in the key and the event time in the id, so neither is repeated per event,
+# and the stream's listpack encoding delta-compresses the ids. Entries written
+# before that carried an explicit event time as
+#   t  event time in epoch ms
+# with an id from when they were added; readers still honour it.
+#
+# Events are appended by one script: in-order events are XADDed with MAXLEN ~,
+# which drops whole listpack nodes instead of re-ranking on every write. An
+# event older than the newest entry (a late or backfilled event, a migrated
+# sorted set) can't be XADDed behind it, so the script instead rebuilds the
+# stream (at most BEHAVIOR_HISTORY_LIMIT entries) in time order into
+# {key}:rebuild and RENAMEs it over the key.
+
+_BEHAVIOR_APPEND_LUA = """
+local key, rebuild = KEYS[1], KEYS[2]
+local limit, ttl = tonumber(ARGV[1]), ARGV[2]
+local events = {}
+for i = 3, #ARGV, 3 do
+    events[#events + 1] = {tonumber(ARGV[i]), {'a', ARGV[i + 1], 'm', ARGV[i + 2]}}
+end
+
+local last_ms, last_seq = -1, -1
+local newest = redis.call('XREVRANGE', key, '+', '-', 'COUNT', 1)
+if #newest > 0 then
+    local ms, seq = string.match(newest[1][1], '^(%d+)-(%d+)$')
+    last_ms, last_seq = tonumber(ms), tonumber(seq)
+end
+local function next_id(ms)
+    if ms == last_ms then
+        last_seq = last_seq + 1
+    else
+        last_ms, last_seq = ms, 0
+    end
+    return string.format('%d-%d', last_ms, last_seq)
+end
+
+if events[1][1] >= last_ms then
+    for _, event in ipairs(events) do
+        redis.call('XADD', key, 'MAXLEN', '~', limit, next_id(event[1]), unpack(event[2]))
+    end
+else
+    local merged = {}
+    for _, entry in ipairs(redis.call('XRANGE', key, '-', '+')) do
+        local ms, fields = tonumber(string.match(entry[1], '^(%d+)')), {}
+        for i = 1, #entry[2], 2 do
+            if entry[2][i] == 't' then
+                ms = tonumber(entry[2][i + 1])
+            else
+                fields[#fields + 1] = entry[2][i]
+                fields[#fields + 1] = entry[2][i + 1]
+            end
+        end
+        merged[#merged + 1] = {ms, fields, #merged}
+    end
+    for _, event in ipairs(events) do
+        merged[#merged + 1] = {event[1], event[2], #merged}
+    end
+    -- By time, existing entries before new ones at the same ms
+    table.sort(merged, function(x, y)
+        if x[1] ~= y[1] then
+            return x[1] < y[1]
+        end
+        return x[3] < y[3]
+    end)
+
+    redis.call('DEL', rebuild)
+    last_ms, last_seq = -1, -1
+    for i = math.max(1, #merged - limit + 1), #merged do
+        redis.call('XADD', rebuild, next_id(merged[i][1]), unpack(merged[i][2]))
+    end
+    redis.call('RENAME', rebuild, key)
+end
+redis.call('EXPIRE', key, ttl)
+return #events
+"""
+
+_behavior_append = redis_client.register_script(_BEHAVIOR_APPEND_LUA)
+
+
+def _behavior_stream_key(user_id: str) -> str:
+    return f"user:{user_id}:events"
+
+
+def _queue_behavior_stream_writes(pipe, user_id: str, events: list, ttl: int = BEHAVIOR_TTL_SECONDS):
+    """
+    Queue the append script for one user's (event_ms, action, metadata)
+    behaviors, which also trims the stream and sets its TTL.
+    """
+    key = _behavior_stream_key(user_id)
+    args = [BEHAVIOR_HISTORY_LIMIT, ttl]
+    for event_ms, action, metadata in sorted(events, key=lambda event: event[0]):
+        args += [event_ms, action, json.dumps(metadata, separators=(",", ":")) if metadata else ""]
+    _behavior_append(keys=[key, f"{key}:rebuild"], args=args, client=pipe)
+
+
+def _stream_behavior(user_id: str, entry_id: str, fields: dict) -> dict:
+    event_ms = int(fields.get("t") or entry_id.split("-", 1)[0])
+    return {
+        "user_id": user_id,
+        "action": fields["a"],
+        "metadata": json.loads(fields["m"]) if fields.get("m") else {},
+        "timestamp": datetime.utcfromtimestamp(event_ms / 1000).isoformat()
+    }
+
+
+def read_user_behaviors(user_id: str, limit: int = 50, since=None) -> list:
+    """
+    A user's behaviors, newest first, as dicts with user_id, action, metadata
+    and timestamp (the shape track_user_behavior has always stored). Reads the
+    stream and any legacy sorted set not migrated yet (written by earlier
+    workers or with BEHAVIOR_STORAGE=zset; the Node API's own sorted sets
+    live in db 0 and aren't read here). since (ISO string, epoch or
+    datetime) drops older events; limit=None returns everything kept.
+    """
+    since = _parse_timestamp(since) if since is not None else None
+    stream_min = _epoch_ms(since) if since else "-"
+    zset_min = since.timestamp() if since else "-inf"
+    
+    stream_key = _behavior_stream_key(user_id)
     
-    # Keep only last 1000 behaviors
-    redis_client.zremrangebyrank(key, 0, -1001)
-    # Expire after 90 days
-    redis_client.expire(key, 90 * 24 * 60 * 60)
+    with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+        pipe.xrevrange(stream_key, "+", stream_min, count=limit)
+        pipe.zrevrangebyscore(f"user:{user_id}:behaviors", "+inf", zset_min,
+                              start=0 if limit else None, num=limit)
+        entries, legacy = pipe.execute()
+    
+    # Older entries with a "t" aren't in id order by event time (their time
+    # is never after their id, so `since` still bounds them); read them all
+    if limit and any("t" in fields for _, fields in entries):
+        entries = redis_client.xrevrange(stream_key, "+", stream_min)
+    
+    behaviors = [_stream_behavior(user_id, entry_id, fields) for entry_id, fields in entries]
+    behaviors += [json.loads(member) for member in legacy]
+    behaviors.sort(key=lambda b: datetime.fromisoformat(b["timestamp"]), reverse=True)
+    if since:
+        behaviors = [b for b in behaviors if datetime.fromisoformat(b["timestamp"]) >= since]
+    return behaviors[:limit] if limit else behaviors
+
+
+# --- Engagement counters ------------------------------------------------------
+#
+# Maintained alongside behavior tracking, one set of keys per UTC day:
+#   engagement:active:{YYYYMMDD}       HLL     users active that day
+#   engagement:active_bits:{YYYYMMDD}  BITMAP  same, by user offset (for retention)
+#   engagement:new:{YYYYMMDD}          HLL     users first seen that day
+#   engagement:cohort:{YYYYMMDD}       BITMAP  same, by user offset
+# plus engagement:user_offsets (HASH user id -> dense bitmap offset) and
+# engagement:user_seq. Reports PFCOUNT / BITOP a few days' keys instead of
+# scanning behavior sets. "New" means first seen by the tracker.
+
+ENGAGEMENT_TTL_SECONDS = 400 * 24 * 60 * 60  # A year of history plus a previous period
+ENGAGEMENT_OFFSETS_KEY = "engagement:user_offsets"
+ENGAGEMENT_SEQ_KEY = "engagement:user_seq"
+
+_ENGAGEMENT_WRITE_LUA = """
+local offset = redis.call('HGET', KEYS[1], ARGV[1])
+local is_new = 0
+if not offset then
+    offset = redis.call('INCR', KEYS[2])
+    redis.call('HSET', KEYS[1], ARGV[1], offset)
+    is_new = 1
+    redis.call('PFADD', KEYS[3], ARGV[1])
+    redis.call('SETBIT', KEYS[4], offset, 1)
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+    redis.call('EXPIRE', KEYS[4], ARGV[2])
+end
+for i = 5, #KEYS, 2 do
+    redis.call('PFADD', KEYS[i], ARGV[1])
+    redis.call('SETBIT', KEYS[i + 1], offset, 1)
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+    redis.call('EXPIRE', KEYS[i + 1], ARGV[2])
+end
+return is_new
+"""
+
+_engagement_write = redis_client.register_script(_ENGAGEMENT_WRITE_LUA)
+
+
+def _engagement_day(score: float) -> str:
+    # Inverse of the naive-datetime .timestamp() used for behavior scores
+    return datetime.fromtimestamp(score).strftime("%Y%m%d")
+
+
+def _queue_engagement_writes(pipe, user_id: str, days):
+    """
+    Queue the engagement counter updates for a user active on the given days
+    (YYYYMMDD strings). A user seen for the first time counts as new on the
+    earliest of those days.
+    """
+    days = sorted(set(days))
+    keys = [ENGAGEMENT_OFFSETS_KEY, ENGAGEMENT_SEQ_KEY,
+            f"engagement:new:{days[0]}", f"engagement:cohort:{days[0]}"]
+    for day in days:
+        keys += [f"engagement:active:{day}", f"engagement:active_bits:{day}"]
+    _engagement_write(keys=keys, args=[user_id, ENGAGEMENT_TTL_SECONDS], client=pipe)
+
+
+@app.task(name="track_user_behavior")
+def track_user_behavior(user_id: str, action: str, metadata: dict = None, timestamp: str = None):
+    """
+    Track user behavior for analytics and personalization.
+    """
+    event_time = _parse_timestamp(timestamp)
+    score = event_time.timestamp()
+    
+    with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+        if BEHAVIOR_STORAGE == "zset":
+            member, score = _behavior_entry(user_id, action, metadata, event_time)
+            _queue_behavior_writes(pipe, user_id, {member: score})
+        else:
+            _queue_behavior_stream_writes(pipe, user_id, [(_epoch_ms(event_time), action, metadata)])
+        _queue_engagement_writes(pipe, user_id, [_engagement_day(score)])
+        pipe.execute()
     
     return {"success": True, "user_id": user_id, "action": action}
 
 
-@app.task(name="generate_profit_loss_report")
-def generate_profit_loss_report(farmer_id: str, period: str = "monthly"):
+@app.task(name="track_user_behavior_batch")
+def track_user_behavior_batch(events: list):
     """
-    Generate profit/loss report for a farmer.
+    Track many behavior events in one task.
+
+    Each event is a dict with user_id, action and optional metadata/timestamp,
+    i.e. the arguments of track_user_behavior. Events are grouped by user and
+    written oldest first with one pipelined round trip per chunk of users, so
+    read_user_behaviors() returns the same as after calling
+    track_user_behavior once per event with the same timestamps.
+    """
+    behaviors_by_user = defaultdict(list)
+    active_days = defaultdict(set)
+    skipped = 0
+    
+    for event in events:
+        user_id = event.get("user_id")
+        action = event.get("action")
+        if not user_id or not action:
+            skipped += 1
+            continue
+        
+        event_time = _parse_timestamp(event.get("timestamp"))
+        behaviors_by_user[user_id].append((event_time, action, event.get("metadata")))
+        active_days[user_id].add(_engagement_day(event_time.timestamp()))
+    
+    # Only the newest entries would survive the trim, so don't send the rest
+    for user_id, behaviors in behaviors_by_user.items():
+        behaviors.sort(key=lambda behavior: behavior[0])
+        if len(behaviors) > BEHAVIOR_HISTORY_LIMIT:
+            behaviors_by_user[user_id] = behaviors[-BEHAVIOR_HISTORY_LIMIT:]
+    
+    users = list(behaviors_by_user.items())
+    for start in range(0, len(users), BEHAVIOR_BATCH_USERS_PER_PIPELINE):
+        with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+            for user_id, behaviors in users[start:start + BEHAVIOR_BATCH_USERS_PER_PIPELINE]:
+                if BEHAVIOR_STORAGE == "zset":
+                    members = dict(
+                        _behavior_entry(user_id, action, metadata, event_time)
+                        for event_time, action, metadata in behaviors
+                    )
+                    _queue_behavior_writes(pipe, user_id, members)
+                else:
+                    entries = [(_epoch_ms(event_time), action, metadata) for event_time, action, metadata in behaviors]
+                    _queue_behavior_stream_writes(pipe, user_id, entries)
+                _queue_engagement_writes(pipe, user_id, active_days[user_id])
+            pipe.execute()
+    
+    return {
+        "success": True,
+        "events_tracked": len(events) - skipped,
+        "users": len(users),
+        "skipped": skipped
+    }
+
+
+@app.task(name="get_user_behaviors")
+def get_user_behaviors(user_id: str, limit: int = 50, since: str = None):
+    """
+    Recent behaviors for a user, newest first.
+    """
+    try:
+        return {"success": True, "user_id": user_id, "behaviors": read_user_behaviors(user_id, limit, since)}
+    except Exception as e:
+        return {"success": False, "message": f"Failed to read user behaviors: {e}"}
+
+
+BEHAVIOR_MIGRATION_SCAN_COUNT = 500
+BEHAVIOR_MIGRATION_MAX_SECONDS = int(os.getenv("BEHAVIOR_MIGRATION_MAX_SECONDS", 15 * 60))
+BEHAVIOR_MIGRATION_CURSOR_KEY = "behavior_migration:cursor"
+
+
+def _migrate_behavior_key(zset_key: str) -> int:
+    """
+    Merge one legacy sorted set into its user's stream in event-time order,
+    keeping the longer of the two TTLs. Runs under WATCH so an event a worker running
+    with BEHAVIOR_STORAGE=zset adds meanwhile isn't deleted unmigrated. Returns the number of events moved.
+    """
+    user_id = zset_key[len("user:"):-len(":behaviors")]
+    stream_key = _behavior_stream_key(user_id)
+    moved = 0
+    
+    def _move(pipe):
+        nonlocal moved
+        members = pipe.zrange(zset_key, 0, -1)
+        ttl = pipe.ttl(zset_key)
+        stream_ttl = pipe.ttl(stream_key)
+        
+        entries = []
+        for member in members:
+            try:
+                behavior = json.loads(member)
+                event_ms = _epoch_ms(_parse_timestamp(behavior["timestamp"]))
+                entries.append((event_ms, behavior["action"], behavior.get("metadata")))
+            except (ValueError, KeyError, TypeError):
+                continue
+        
+        pipe.multi()
+        if entries:
+            _queue_behavior_stream_writes(pipe, user_id, entries,
+                                          ttl=max(ttl, stream_ttl) if ttl > 0 else BEHAVIOR_TTL_SECONDS)
+        pipe.delete(zset_key)
+        moved = len(entries)
+    
+    redis_manager.transaction(ANALYTICS_DB, _move, zset_key)
+    return moved
+
+
+@app.task(name="migrate_behavior_storage")
+def migrate_behavior_storage(max_seconds: int = BEHAVIOR_MIGRATION_MAX_SECONDS):
+    """
+    Convert legacy user:{id}:behaviors sorted sets into user:{id}:events
+    streams. The SCAN cursor is checkpointed, so a run that hits max_seconds
+    is picked up by the next one; once a full pass finishes the checkpoint is
+    cleared and a later run (e.g. for sets written with BEHAVIOR_STORAGE=zset) starts over.
     """
     try:
-        # Call backend API to get farmer's orders
-        url = f"{ANALYTICS_API_BASE}/farmers/orders"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        orders = response.json().get("data", [])
+        deadline = time.monotonic() + max_seconds
+        cursor = int(redis_client.get(BEHAVIOR_MIGRATION_CURSOR_KEY) or 0)
+        keys_migrated = 0
+        events_migrated = 0
+        
+        while True:
+            cursor, keys = redis_client.scan(cursor, match="user:*:behaviors", count=BEHAVIOR_MIGRATION_SCAN_COUNT)
+            for key in keys:
+                events_migrated += _migrate_behavior_key(key)
+                keys_migrated += 1
+            if cursor == 0 or time.monotonic() >= deadline:
+                break
+        
+        if cursor == 0:
+            redis_client.delete(BEHAVIOR_MIGRATION_CURSOR_KEY)
+        else:
+            redis_client.set(BEHAVIOR_MIGRATION_CURSOR_KEY, cursor)
         
-        # Filter orders for this farmer
-        farmer_orders = [order for order in orders if order.get("farmerId") == farmer_id]
+        return {
+            "success": True,
+            "keys_migrated": keys_migrated,
+            "events_migrated": events_migrated,
+            "complete": cursor == 0
+        }
         
-        # Calculate profit/loss
-        total_revenue = 0
-        total_cost = 0
+    except Exception as e:
+        return {"success": False, "message": f"Failed to migrate behavior storage: {e}"}
+
+
+ORDERS_PAGE_SIZE = int(os.getenv("ANALYTICS_ORDERS_PAGE_SIZE", 200))
+COST_OF_GOODS_RATIO = 0.3  # Assuming 30% cost of goods sold
+
+PERIOD_DAYS = {
+    "daily": 1,
+    "weekly": 7,
+    "monthly": 30,
+    "quarterly": 90,
+    "yearly": 365,
+}
+
+
+def _period_days(period: str):
+    """
+    Length in days of a period name ("monthly") or a range like "7d";
+    None for unknown periods.
+    """
+    if period in PERIOD_DAYS:
+        return PERIOD_DAYS[period]
+    if period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1])
+    return None
+
+
+def _iter_farmer_orders(farmer_id: str, since: datetime = None, until: datetime = None,
+                        page_size: int = ORDERS_PAGE_SIZE):
+    """
+    Yield a farmer's orders page by page from /farmers/orders.
+    The farmer and date range are sent as query params so the API only
+    returns matching orders (the API honors farmerId for admin callers,
+    which the ANALYTICS_API_TOKEN service credential is);
+    each page is released before the next is fetched.
+    """
+    params = {"farmerId": farmer_id, "limit": page_size}
+    if since:
+        params["from"] = since.isoformat()
+    if until:
+        params["to"] = until.isoformat()
+    
+    page = 1
+    while True:
+        body = analytics_api.get_json("/farmers/orders", params={**params, "page": page})
+        orders = body.get("data", [])
+        yield from orders
+        
+        total = body.get("pagination", {}).get("total")
+        if len(orders) < page_size or (total is not None and page * page_size >= total):
+            break
+        page += 1
+
+
+def _aggregate_profit_loss(orders, farmer_id: str) -> dict:
+    """
+    Sum revenue and cost over a stream of orders, counting only this
+    farmer's line items.
+    """
+    total_revenue = 0
+    order_count = 0
+    
+    for order in orders:
+        if order.get("farmerId", farmer_id) != farmer_id:
+            continue
         
-        for order in farmer_orders:
-            for item in order.get("items", []):
-                total_revenue += item.get("price", 0) * item.get("quantity", 0)
-                # Assuming 30% cost of goods sold
-                total_cost += item.get("price", 0) * item.get("quantity", 0) * 0.3
+        order_revenue = 0
+        farmer_items = 0
+        for item in order.get("items", []):
+            if str(item.get("farmer", farmer_id)) != farmer_id:
+                continue
+            order_revenue += item.get("price", 0) * item.get("quantity", 0)
+            farmer_items += 1
         
+        if farmer_items:
+            total_revenue += order_revenue
+            order_count += 1
+    
+    return {
+        "total_revenue": total_revenue,
+        "total_cost": total_revenue * COST_OF_GOODS_RATIO,
+        "order_count": order_count
+    }
+
+
+@app.task(name="generate_profit_loss_report")
+def generate_profit_loss_report(farmer_id: str, period: str = "monthly"):
+    """
+    Generate profit/loss report for a farmer.
+    """
+    try:
+        now = datetime.utcnow()
+        days = _period_days(period)
+        if days:
+            # Whole UTC days ending today, summed from the daily rollups
+            start_date = now.date() - timedelta(days=days - 1)
+            period_start = datetime.combine(start_date, datetime.min.time())
+            _ensure_farmer_rollups(farmer_id)
+            sales = salesRollups.sales_summary("farmer", farmer_id, start_date, days)
+            totals = {
+                "total_revenue": sales["revenue"],
+                "total_cost": sales["revenue"] * COST_OF_GOODS_RATIO,
+                "order_count": sales["order_count"]
+            }
+        else:
+            # All time: stream the farmer's orders from the backend API
+            period_start = None
+            totals = _aggregate_profit_loss(_iter_farmer_orders(farmer_id, until=now), farmer_id)
+        
+        total_revenue = totals["total_revenue"]
+        total_cost = totals["total_cost"]
         profit = total_revenue - total_cost
         profit_margin = (profit / total_revenue * 100) if total_revenue > 0 else 0
         
         report_data = {
             "farmer_id": farmer_id,
             "period": period,
-            "generated_at": datetime.utcnow().isoformat(),
+            "period_start": period_start.isoformat() if period_start else None,
+            "generated_at": now.isoformat(),
             "total_revenue": total_revenue,
             "total_cost": total_cost,
             "profit": profit,
             "profit_margin": profit_margin,
-            "order_count": len(farmer_orders)
+            "order_count": totals["order_count"]
         }
         
         # Cache in Redis for quick dashboard access
@@ -159,26 +653,229 @@ def generate_profit_loss_report(farmer_id: str, period: str = "monthly"):
         return {"success": False, "message": f"Failed to generate profit/loss report: {e}"}
 
 
+ORDER_EVENTS_PER_PIPELINE = 500
+
+
+@app.task(name="ingest_order_events")
+def ingest_order_events(orders: list):
+    """
+    Fold order events into the sales rollups (see salesRollups).
+
+    Each order has an _id, createdAt, status and items with product,
+    farmer, price and quantity, as returned by the orders API; the Node API
+    sends one when an order is created and on every status change. Orders
+    already ingested (by _id) are skipped, cancelled orders counted earlier
+    are taken back out, and orders older than the daily rollups keep
+    (salesRollups.ROLLUP_HORIZON_DAYS) are ignored. Line items are summed per
+    product/farmer and day/hour in memory first; each order's claim and
+    increments then run as one script, pipelined per chunk of orders.
+    """
+    try:
+        # A cancelled order without an id can't have been claimed
+        orders = [order for order in orders
+                  if order.get("status") != "cancelled" or salesRollups.order_id(order)]
+        now = time.time()
+        ingested = cancelled = queued = 0
+        
+        for start in range(0, len(orders), ORDER_EVENTS_PER_PIPELINE):
+            with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+                for order in orders[start:start + ORDER_EVENTS_PER_PIPELINE]:
+                    queued += salesRollups.queue_order_ingest(pipe, order, now)
+                for reply in pipe.execute():
+                    ingested += reply == 1
+                    cancelled += reply == -1
+        
+        return {
+            "success": True,
+            "orders_ingested": ingested,
+            "orders_cancelled": cancelled,
+            "duplicates": queued - ingested - cancelled,
+            "too_old": len(orders) - queued
+        }
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to ingest order events: {e}"}
+
+
+@app.task(name="backfill_sales_rollups")
+def backfill_sales_rollups(farmer_id: str, days: int = 90):
+    """
+    Ingest a farmer's orders from the last `days` days from the backend API,
+    e.g. after enabling rollups. Orders already ingested are skipped; `days`
+    is capped at the daily rollups' horizon. Reports and
+    backfill_all_sales_rollups run it over the whole horizon for farmers
+    that haven't been backfilled yet.
+    """
+    try:
+        days = min(days, salesRollups.ROLLUP_HORIZON_DAYS)
+        since = datetime.utcnow() - timedelta(days=days)
+        totals = {"orders_ingested": 0, "orders_cancelled": 0, "duplicates": 0, "too_old": 0}
+        batch = []
+        for order in _iter_farmer_orders(farmer_id, since=since):
+            batch.append(order)
+            if len(batch) >= ORDER_EVENTS_PER_PIPELINE:
+                result = ingest_order_events(batch)
+                if not result["success"]:
+                    return result
+                totals = {key: totals[key] + result[key] for key in totals}
+                batch = []
+        if batch:
+            result = ingest_order_events(batch)
+            if not result["success"]:
+                return result
+            totals = {key: totals[key] + result[key] for key in totals}
+        if days == salesRollups.ROLLUP_HORIZON_DAYS:
+            salesRollups.mark_backfilled("farmer", farmer_id)
+        
+        return {"success": True, "farmer_id": farmer_id, **totals}
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to backfill sales rollups: {e}"}
+
+
+def _ensure_farmer_rollups(farmer_id: str):
+    """
+    Backfill a farmer's rollups over the whole horizon the first time they
+    are read, so orders placed before events were ingested are counted.
+    """
+    if salesRollups.is_backfilled("farmer", farmer_id):
+        return
+    result = backfill_sales_rollups(farmer_id, days=salesRollups.ROLLUP_HORIZON_DAYS)
+    if not result["success"]:
+        raise RuntimeError(result["message"])
+
+
+@app.task(name="backfill_all_sales_rollups")
+def backfill_all_sales_rollups():
+    """
+    Backfill every farmer not backfilled yet, which also fills the product
+    rollups demand forecasts read. Runs daily from beat; after the first run
+    only new farmers are fetched.
+    """
+    try:
+        farmers = analytics_api.get_json("/admin/farmers").get("data", [])
+        backfilled = 0
+        for farmer in farmers:
+            farmer_id = str(farmer.get("_id") or farmer.get("id"))
+            if salesRollups.is_backfilled("farmer", farmer_id):
+                continue
+            result = backfill_sales_rollups(farmer_id, days=salesRollups.ROLLUP_HORIZON_DAYS)
+            if not result["success"]:
+                return result
+            backfilled += 1
+        
+        return {"success": True, "farmers_backfilled": backfilled}
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to backfill sales rollups: {e}"}
+
+
+def _day_range(start: datetime, days: int) -> list:
+    return [(start + timedelta(days=n)).strftime("%Y%m%d") for n in range(days)]
+
+
+def engagement_counts(start: datetime, days: int) -> dict:
+    """
+    Unique active and new users over `days` UTC days from `start`, the daily
+    active series, and retention: the share of users first seen in the
+    preceding window of the same length who were active in this one.
+    """
+    current = _day_range(start, days)
+    previous = _day_range(start - timedelta(days=days), days)
+    scratch = f"engagement:tmp:{os.getpid()}:{datetime.utcnow().timestamp()}"
+    
+    with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+        pipe.pfcount(*[f"engagement:active:{day}" for day in current])
+        pipe.pfcount(*[f"engagement:new:{day}" for day in current])
+        for day in current:
+            pipe.pfcount(f"engagement:active:{day}")
+        pipe.bitop("OR", f"{scratch}:cohort", *[f"engagement:cohort:{day}" for day in previous])
+        pipe.bitop("OR", f"{scratch}:active", *[f"engagement:active_bits:{day}" for day in current])
+        pipe.bitcount(f"{scratch}:cohort")
+        pipe.bitop("AND", f"{scratch}:retained", f"{scratch}:cohort", f"{scratch}:active")
+        pipe.bitcount(f"{scratch}:retained")
+        pipe.delete(f"{scratch}:cohort", f"{scratch}:active", f"{scratch}:retained")
+        results = pipe.execute()
+    
+    active_users, new_users = results[0], results[1]
+    daily_active = dict(zip(current, results[2:2 + days]))
+    cohort_size, retained = results[2 + days + 2], results[2 + days + 4]
+    return {
+        "active_users": active_users,
+        "new_users": new_users,
+        "daily_active_users": daily_active,
+        "previous_cohort_size": cohort_size,
+        "retained_users": retained,
+        "retention_rate": (retained / cohort_size * 100) if cohort_size else 0,
+    }
+
+
+def cohort_retention(cohort_day: str, days: int = 30) -> dict:
+    """
+    Day-N retention for the users first seen on cohort_day (YYYYMMDD):
+    {"cohort_size", "retention": {N: share of the cohort active on day N}}.
+    """
+    start = datetime.strptime(cohort_day, "%Y%m%d")
+    cohort_key = f"engagement:cohort:{cohort_day}"
+    scratch = f"engagement:tmp:{os.getpid()}:{datetime.utcnow().timestamp()}"
+    
+    with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+        pipe.bitcount(cohort_key)
+        for offset, day in enumerate(_day_range(start + timedelta(days=1), days), start=1):
+            pipe.bitop("AND", f"{scratch}:{offset}", cohort_key, f"engagement:active_bits:{day}")
+            pipe.bitcount(f"{scratch}:{offset}")
+        pipe.delete(*[f"{scratch}:{offset}" for offset in range(1, days + 1)])
+        results = pipe.execute()
+    
+    cohort_size = results[0]
+    retained = results[2:2 + 2 * days:2]
+    return {
+        "cohort_day": cohort_day,
+        "cohort_size": cohort_size,
+        "retention": {
+            offset: (count / cohort_size * 100) if cohort_size else 0
+            for offset, count in enumerate(retained, start=1)
+        }
+    }
+
+
 @app.task(name="generate_user_engagement_report")
-def generate_user_engagement_report(period: str = "weekly"):
+def generate_user_engagement_report(period: str = "weekly", start_date: str = None, end_date: str = None):
     """
     Generate user engagement report for admins.
+    period is a name ("weekly", "monthly", ...) or "Nd" ending today; pass
+    start_date/end_date (YYYY-MM-DD, inclusive) for a custom range instead.
     """
     try:
-        # Get user behavior data from Redis
-        # This is a simplified example - in practice you'd aggregate from multiple sources
-        active_users_key = "active_users:weekly"  # This would be populated by other processes
-        new_users_key = "new_users:weekly"  # This would be populated by other processes
+        if start_date:
+            start = datetime.strptime(start_date, "%Y-%m-%d")
+            end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.utcnow()
+            days = (end.date() - start.date()).days + 1
+            period = f"{start_date}..{end.strftime('%Y-%m-%d')}"
+        else:
+            days = _period_days(period)
+            if not days:
+                return {"success": False, "message": f"Unknown period: {period}"}
+            start = datetime.utcnow() - timedelta(days=days - 1)
+        if days < 1:
+            return {"success": False, "message": "end_date is before start_date"}
         
-        active_users_count = int(redis_client.get(active_users_key) or 0)
-        new_users_count = int(redis_client.get(new_users_key) or 0)
+        counts = engagement_counts(start, days)
+        active_users_count = counts["active_users"]
+        new_users_count = counts["new_users"]
         
         report_data = {
             "period": period,
             "generated_at": datetime.utcnow().isoformat(),
+            "start_date": start.strftime("%Y-%m-%d"),
+            "days": days,
             "active_users": active_users_count,
             "new_users": new_users_count,
-            "engagement_rate": (active_users_count / max(new_users_count, 1)) * 100
+            "engagement_rate": (active_users_count / max(new_users_count, 1)) * 100,
+            "retention_rate": counts["retention_rate"],
+            "previous_cohort_size": counts["previous_cohort_size"],
+            "retained_users": counts["retained_users"],
+            "daily_active_users": counts["daily_active_users"]
         }
         
         # Cache in Redis
@@ -190,7 +887,7 @@ def generate_user_engagement_report(period: str = "weekly"):
         os.makedirs(reports_dir, exist_ok=True)
         
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"user_engagement_report_{period}_{timestamp}.json"
+        filename = f"user_engagement_report_{period.replace('..', '_')}_{timestamp}.json"
         path = os.path.join(reports_dir, filename)
         
         with open(path, "w", encoding="utf-8") as f:
@@ -206,6 +903,18 @@ def generate_user_engagement_report(period: str = "weekly"):
         return {"success": False, "message": f"Failed to generate user engagement report: {e}"}
 
 
+@app.task(name="get_cohort_retention")
+def get_cohort_retention(cohort_date: str, days: int = 30):
+    """
+    Day-1..N retention for users first seen on cohort_date (YYYY-MM-DD).
+    """
+    try:
+        cohort_day = datetime.strptime(cohort_date, "%Y-%m-%d").strftime("%Y%m%d")
+        return {"success": True, "data": cohort_retention(cohort_day, days)}
+    except Exception as e:
+        return {"success": False, "message": f"Failed to compute cohort retention: {e}"}
+
+
 @app.task(name="update_analytics_cache")
 def update_analytics_cache():
     """
@@ -213,18 +922,17 @@ def update_analytics_cache():
     """
     try:
         # Fetch platform stats
-        url = f"{ANALYTICS_API_BASE}/admin/stats"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        stats = response.json()
+        stats = analytics_api.get_json("/admin/stats", cache_ttl=STATS_CACHE_TTL_SECONDS)
         
         # Cache in Redis
-        redis_client.setex("platform_stats", 1800, json.dumps(stats))  # Cache for 30 minutes
-        
-        # Also update individual stat caches
         data = stats.get("data", {})
-        for key, value in data.items():
-            redis_client.setex(f"stat:{key}", 1800, str(value))
+        with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+            pipe.setex("platform_stats", 1800, json.dumps(stats))  # Cache for 30 minutes
+            
+            # Also update individual stat caches
+            for key, value in data.items():
+                pipe.setex(f"stat:{key}", 1800, str(value))
+            pipe.execute()
             
         return {"success": True, "cached_keys": list(data.keys())}
         
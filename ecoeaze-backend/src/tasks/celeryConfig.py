@@ -0,0 +1,32 @@
+# src/tasks/celeryConfig.py
+import os
+import sys
+import importlib.util
+
+# celery/celeryconfig.py, loaded by path so task modules get the same queues
+# and routes whether or not celery_worker.py has put celery/ on sys.path
+CELERYCONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "celery", "celeryconfig.py"))
+
+
+def load_celeryconfig():
+    """
+    The celeryconfig module: the copy celery_worker.py imported if there is
+    one, otherwise loaded from CELERYCONFIG_PATH. Errors propagate, so a
+    broken config fails the import instead of leaving tasks unrouted.
+    """
+    module = sys.modules.get("celeryconfig")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("celeryconfig", CELERYCONFIG_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules["celeryconfig"] = module
+    return module
+
+
+def configure_app(app):
+    """
+    Apply celeryconfig to a task module's Celery app, so .delay() from inside
+    a task is routed the same way as through celery_worker.celery_app.
+    """
+    app.config_from_object(load_celeryconfig())
+    return app
@@ -0,0 +1,156 @@
+# src/tasks/emailTemplates.py
+import html
+from functools import lru_cache
+from string import Template
+from textwrap import dedent
+
+# Email templates use string.Template ${placeholders}. Values are HTML-escaped
+# in html_body, except context keys ending in "_html" (pre-rendered fragments).
+TEMPLATE_SOURCES = {
+    "welcome": {
+        "subject": "Welcome to EcoEaze!",
+        "body": """
+            Hi ${user_name},
+
+            Welcome to EcoEaze! We're excited to have you join our community of sustainable shoppers and farmers.
+
+            As a ${role}, you'll enjoy:
+            - Fresh, organic produce directly from local farms
+            - Competitive pricing with no middlemen
+            - Real-time updates on your orders
+
+            Start exploring our marketplace today!
+
+            Best regards,
+            The EcoEaze Team
+            """,
+        "html_body": """
+            <html>
+            <body>
+                <h2>Welcome to EcoEaze!</h2>
+                <p>Hi ${user_name},</p>
+
+                <p>Welcome to EcoEaze! We're excited to have you join our community of sustainable shoppers and farmers.</p>
+
+                <p>As a ${role}, you'll enjoy:</p>
+                <ul>
+                    <li>Fresh, organic produce directly from local farms</li>
+                    <li>Competitive pricing with no middlemen</li>
+                    <li>Real-time updates on your orders</li>
+                </ul>
+
+                <p>Start exploring our marketplace today!</p>
+
+                <p>Best regards,<br/>
+                The EcoEaze Team</p>
+            </body>
+            </html>
+            """,
+    },
+    "order_confirmation": {
+        "subject": "Order Confirmation - #${order_id}",
+        "body": """
+            Hi ${user_name},
+
+            Thank you for your order! Here are the details:
+
+            Order ID: ${order_id}
+
+            Items:
+            ${items}
+
+            Total Amount: ₹${total_amount}
+
+            Your order is being processed and will be shipped soon. We'll notify you when it's on its way.
+
+            Best regards,
+            The EcoEaze Team
+            """,
+        "html_body": """
+            <html>
+            <body>
+                <h2>Order Confirmation</h2>
+                <p>Hi ${user_name},</p>
+
+                <p>Thank you for your order! Here are the details:</p>
+
+                <p><strong>Order ID:</strong> ${order_id}</p>
+
+                <h3>Items:</h3>
+                <ul>
+                ${items_html}
+                </ul>
+
+                <p><strong>Total Amount:</strong> ₹${total_amount}</p>
+
+                <p>Your order is being processed and will be shipped soon. We'll notify you when it's on its way.</p>
+
+                <p>Best regards,<br/>
+                The EcoEaze Team</p>
+            </body>
+            </html>
+            """,
+    },
+    "order_item": {
+        "body": "- ${name} x ${quantity} @ ₹${price}",
+        "html_body": "<li>${name} x ${quantity} @ ₹${price}</li>",
+    },
+    "otp": {
+        "subject": "Your EcoEaze verification code",
+        "body": """
+            Hi,
+
+            Your EcoEaze verification code is: ${code}
+
+            This code will expire in ${expires_minutes} minutes. If you did not request this, please ignore this email.
+
+            Best,
+            EcoEaze Team
+            """,
+        "html_body": """
+            <html>
+            <body>
+                <p>Hi,</p>
+                <p>Your EcoEaze verification code is: <strong>${code}</strong></p>
+                <p>This code will expire in ${expires_minutes} minutes. If you did not request this, please ignore this email.</p>
+                <p>Best,<br/>EcoEaze Team</p>
+            </body>
+            </html>
+            """,
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> dict:
+    """
+    Compile a template once per worker: dedent each part and wrap it in a
+    string.Template. Raises KeyError for unknown templates.
+    """
+    return {part: Template(dedent(source).strip("\n")) for part, source in TEMPLATE_SOURCES[name].items()}
+
+
+def _html_context(context: dict) -> dict:
+    return {
+        key: value if key.endswith("_html") else html.escape(str(value))
+        for key, value in context.items()
+    }
+
+
+def render_part(name: str, part: str, /, **context) -> str:
+    template = get_template(name)[part]
+    if part == "html_body":
+        context = _html_context(context)
+    return template.substitute(context)
+
+
+def render_email(name: str, /, **context):
+    """
+    Render a template's parts. Returns (subject, body, html_body); parts the
+    template doesn't define are None.
+    """
+    template = get_template(name)
+    return tuple(
+        render_part(name, part, **context) if part in template else None
+        for part in ("subject", "body", "html_body")
+    )
@@ -0,0 +1,143 @@
+# src/tasks/httpClient.py
+import os
+import json
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 256))
+
+
+class HttpClient:
+    """
+    Keep-alive JSON client for one API base URL.
+
+    Each worker process gets its own requests.Session with a connection pool
+    and retry/backoff on connection errors and 502/503/504. The session is
+    built up front and rebuilt in a forked child, so threads sharing the
+    client never race to create one. GET responses can
+    be cached in-process: while fresh they are served without a request, and
+    once stale they are revalidated with If-None-Match / If-Modified-Since so
+    an unchanged payload costs only a 304.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10, max_cache_entries: int = HTTP_CACHE_MAX_ENTRIES,
+                 token: str = None):
+        self.base_url = base_url.rstrip("/")
+        # Sent as "Authorization: Bearer <token>" on every request
+        self.token = token
+        self.timeout = timeout
+        self.max_cache_entries = max_cache_entries
+        # cache key -> {"expires_at", "etag", "last_modified", "content"}
+        self._cache = OrderedDict()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self.reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        if self.token:
+            session.headers["Authorization"] = f"Bearer {self.token}"
+        retry = Retry(
+            total=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def reset(self):
+        """
+        Replace the session and cache, e.g. in a forked child, whose inherited
+        sockets belong to the parent. Like RedisConnectionManager.reset, the
+        lock is replaced rather than acquired.
+        """
+        self._lock = threading.Lock()
+        self._session = self._new_session()
+        self._cache.clear()
+        self._pid = os.getpid()
+
+    def session(self) -> requests.Session:
+        if self._pid != os.getpid():
+            # Only reached where os.register_at_fork isn't available
+            self.reset()
+        return self._session
+
+    def _cache_key(self, path: str, params: dict = None) -> str:
+        return path + "?" + "&".join(f"{key}={params[key]}" for key in sorted(params or {}))
+
+    def _cache_get(self, key: str):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _cache_put(self, key: str, entry: dict):
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+    def get_json(self, path: str, params: dict = None, cache_ttl: float = 0):
+        """
+        GET base_url + path and decode the JSON body.
+        With cache_ttl > 0 the response is cached for that many seconds and
+        revalidated conditionally afterwards. Error statuses (e.g. 401 for a
+        missing or wrong token) raise requests.HTTPError and aren't cached.
+        """
+        url = f"{self.base_url}{path}"
+        session = self.session()
+
+        if not cache_ttl:
+            response = session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        key = self._cache_key(path, params)
+        entry = self._cache_get(key)
+        if entry is not None and entry["expires_at"] > time.monotonic():
+            self.stats["hits"] += 1
+            return json.loads(entry["content"])
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            self.stats["revalidated"] += 1
+            self._cache_put(key, {**entry, "expires_at": time.monotonic() + cache_ttl})
+            return json.loads(entry["content"])
+
+        response.raise_for_status()
+        self.stats["misses"] += 1
+        self._cache_put(key, {
+            "expires_at": time.monotonic() + cache_ttl,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content": response.content,
+        })
+        return response.json()
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,129 @@
+# src/tasks/imageCache.py
+import os
+import json
+import time
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", 10000))
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv("IMAGE_CACHE_TTL", 7 * 86400))
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's contents, read in 1 MB chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageResultCache:
+    """
+    Content-addressed cache of image processing results in Redis.
+
+    Entries are keyed by operation, the SHA-256 of the input file and a hash of
+    the processing parameters, so a re-upload of the same bytes with the same
+    settings reuses the earlier result and its output files. An entry whose
+    output files have since been deleted counts as a miss and is dropped.
+
+    Entries expire after ttl seconds; beyond that, an LRU index (ZSET scored
+    by last access) caps the cache at max_entries. Hit/miss/store/eviction
+    counters are kept in a hash, overall and per operation.
+    """
+
+    def __init__(self, client, prefix: str = "image_cache", max_entries: int = IMAGE_CACHE_MAX_ENTRIES,
+                 ttl: int = IMAGE_CACHE_TTL_SECONDS):
+        self.client = client
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lru_key = f"{prefix}:lru"
+        self.stats_key = f"{prefix}:stats"
+
+    def key(self, operation: str, digest: str, params: dict = None) -> str:
+        params_hash = hashlib.sha256(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()[:16]
+        return f"{self.prefix}:{operation}:{digest}:{params_hash}"
+
+    def _count(self, pipe, operation: str, counter: str, amount: int = 1):
+        pipe.hincrby(self.stats_key, counter, amount)
+        pipe.hincrby(self.stats_key, f"{operation}:{counter}", amount)
+
+    def get(self, operation: str, digest: str, params: dict = None):
+        """
+        Cached result for these inputs, or None on a miss.
+        """
+        key = self.key(operation, digest, params)
+        raw = self.client.get(key)
+        entry = json.loads(raw) if raw else None
+
+        with self.client.pipeline(transaction=False) as pipe:
+            if entry is not None and all(os.path.exists(path) for path in entry["paths"]):
+                pipe.zadd(self.lru_key, {key: time.time()})
+                pipe.expire(key, self.ttl)
+                self._count(pipe, operation, "hits")
+                pipe.execute()
+                return entry["result"]
+
+            if entry is not None:
+                # Outputs were cleaned up; the entry can't be reused
+                pipe.delete(key)
+                pipe.zrem(self.lru_key, key)
+            self._count(pipe, operation, "misses")
+            pipe.execute()
+        return None
+
+    def put(self, operation: str, digest: str, params: dict, result, paths: list = ()):
+        """
+        Store a result. paths are the output files it refers to; the entry is
+        only served while all of them still exist.
+        """
+        key = self.key(operation, digest, params)
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.setex(key, self.ttl, json.dumps({"result": result, "paths": list(paths)}))
+            pipe.zadd(self.lru_key, {key: time.time()})
+            self._count(pipe, operation, "stores")
+            pipe.zcard(self.lru_key)
+            size = pipe.execute()[-1]
+
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def live_paths(self, operation: str = None, batch_size: int = 500) -> set:
+        """
+        Output paths of every cached entry (of one operation, or all), i.e.
+        the files a cache hit may still hand out.
+        """
+        prefix = f"{self.prefix}:{operation}:" if operation else f"{self.prefix}:"
+        keys = [key for key in self.client.zrange(self.lru_key, 0, -1) if key.startswith(prefix)]
+        paths = set()
+        for start in range(0, len(keys), batch_size):
+            for raw in self.client.mget(keys[start:start + batch_size]):
+                if raw:
+                    paths.update(json.loads(raw)["paths"])
+        return paths
+
+    def _evict(self, count: int):
+        evicted = [member for member, _ in self.client.zpopmin(self.lru_key, count)]
+        if not evicted:
+            return
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*evicted)
+            pipe.hincrby(self.stats_key, "evictions", len(evicted))
+            pipe.execute()
+
+    def stats(self) -> dict:
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.stats_key)
+            pipe.zcard(self.lru_key)
+            counters, size = pipe.execute()
+        stats = {field: int(value) for field, value in counters.items()}
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["entries"] = size
+        stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return stats
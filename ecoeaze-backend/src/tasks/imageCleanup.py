@@ -0,0 +1,197 @@
+# src/tasks/imageCleanup.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_THREADS = int(os.getenv("IMAGE_CLEANUP_THREADS", 4))
+# Directory entries between progress yields while nothing matches
+SCAN_HEARTBEAT_ENTRIES = 1000
+
+
+def _relative_parts(root: str, directory: str) -> tuple:
+    relative = os.path.relpath(directory, root)
+    return () if relative == os.curdir else tuple(relative.split(os.sep))
+
+
+def iter_expired_files(root: str, cutoff: float, match=None, resume_after: tuple = None):
+    """
+    Walk root with os.scandir and yield (directory_parts, path, size) for every
+    regular file last modified before cutoff (and whose path passes match).
+    Every SCAN_HEARTBEAT_ENTRIES entries a (directory_parts, None, 0) progress
+    item is yielded too, so callers can stop on time even when nothing matches.
+
+    Directories are visited depth-first in name order, so a walk can resume
+    from the directory_parts of an earlier yield: directories ordered before
+    it are skipped, and only its ancestors are re-entered to reach it. Files
+    are streamed in directory order without being collected first, so huge
+    flat directories don't have to fit in memory.
+    """
+    stack = [root]
+    seen = 0
+    while stack:
+        directory = stack.pop()
+        parts = _relative_parts(root, directory)
+        skip_files = resume_after is not None and parts < resume_after
+        if skip_files and resume_after[:len(parts)] != parts:
+            # Finished in an earlier run, along with everything below it
+            continue
+
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    seen += 1
+                    if seen % SCAN_HEARTBEAT_ENTRIES == 0:
+                        yield parts, None, 0
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                            continue
+                        if skip_files or not entry.is_file(follow_symlinks=False):
+                            continue
+                        if match is not None and not match(entry.path):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.st_mtime < cutoff:
+                        yield parts, entry.path, stat.st_size
+        except OSError:
+            continue
+        stack.extend(sorted(subdirectories, reverse=True))
+
+
+class OrphanedDerivedFiles:
+    """
+    iter_expired_files() match for an upload tree: passes generated outputs
+    whose source upload is gone and that aren't in keep (e.g. files cached
+    results still point to). source(path) gives an output's upload as
+    (directory, name without extension), or None for anything that isn't a
+    generated output.
+
+    Each upload directory's names are indexed once, when the walk reaches its
+    first output, so checking stays one set lookup per file.
+    """
+
+    def __init__(self, source, keep=()):
+        self.source = source
+        self.keep = {os.path.abspath(path) for path in keep}
+        self._directory = None
+        self._uploads = set()
+
+    @staticmethod
+    def _index(directory: str) -> set:
+        uploads = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        uploads.add(os.path.splitext(entry.name)[0])
+        except OSError:
+            pass
+        return uploads
+
+    def __call__(self, path: str) -> bool:
+        source = self.source(path)
+        if source is None or os.path.abspath(path) in self.keep:
+            return False
+        directory, upload = source
+        if directory != self._directory:
+            self._directory = directory
+            self._uploads = self._index(directory)
+        return upload not in self._uploads
+
+
+def _delete_batch(paths: list) -> tuple:
+    deleted, freed, errors = 0, 0, 0
+    for path, size in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            errors += 1
+            continue
+        deleted += 1
+        freed += size
+    return deleted, freed, errors
+
+
+class CleanupBudget:
+    """
+    Limits for one cleanup run: wall time, total deletes and a delete rate
+    (files per second) so the disk keeps serving uploads meanwhile. Shared by
+    every delete_files() call in the run; queued counts files handed to it.
+    """
+
+    def __init__(self, max_seconds: float = None, max_deletes: int = None, max_deletes_per_second: float = None):
+        self.max_seconds = max_seconds
+        self.max_deletes = max_deletes
+        self.max_deletes_per_second = max_deletes_per_second
+        self.started = time.monotonic()
+        self.queued = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exhausted(self) -> bool:
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return True
+        return self.max_deletes is not None and self.queued >= self.max_deletes
+
+    def throttle(self):
+        if self.max_deletes_per_second:
+            ahead = self.queued / self.max_deletes_per_second - self.elapsed()
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def delete_files(files, budget: CleanupBudget, batch_size: int = CLEANUP_BATCH_SIZE,
+                 threads: int = CLEANUP_THREADS) -> dict:
+    """
+    Delete files from an iter_expired_files() stream in batches on a bounded
+    thread pool, stopping when the stream ends or the budget runs out.
+
+    At most `threads` batches are queued beyond the ones running, so memory
+    stays flat however many files match. Returns the counts plus
+    "position": the directory_parts reached when the budget ran out, or None
+    if the stream was exhausted.
+    """
+    stats = {"expired": 0, "deleted": 0, "bytes_freed": 0, "errors": 0, "position": None}
+    pending = set()
+
+    def collect(done):
+        for future in done:
+            deleted, freed, errors = future.result()
+            stats["deleted"] += deleted
+            stats["bytes_freed"] += freed
+            stats["errors"] += errors
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        batch = []
+        finished = True
+        for parts, path, size in files:
+            stats["position"] = parts
+            if path is not None:
+                batch.append((path, size))
+                stats["expired"] += 1
+                budget.queued += 1
+            if len(batch) >= batch_size:
+                if len(pending) >= threads * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(_delete_batch, batch))
+                batch = []
+                budget.throttle()
+            if budget.exhausted():
+                finished = False
+                break
+
+        if batch:
+            pending.add(executor.submit(_delete_batch, batch))
+        collect(wait(pending)[0])
+
+    if finished:
+        stats["position"] = None
+    return stats
@@ -0,0 +1,256 @@
+# src/tasks/imagePipeline.py
+import io
+import math
+import os
+import re
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont, ImageOps, features
+
+OPTIMIZED_MAX_SIZE = (1200, 1200)
+THUMBNAIL_SIZES = {
+    "small": (150, 150),
+    "medium": (300, 300),
+    "large": (600, 600),
+}
+JPEG_QUALITY = 85
+
+# Target encoded size per rendition for the modern-format variants
+VARIANT_BYTE_BUDGETS = {
+    "optimized": 150 * 1024,
+    "large": 60 * 1024,
+    "medium": 25 * 1024,
+    "small": 8 * 1024,
+}
+VARIANT_MIN_QUALITY = 30
+VARIANT_MAX_QUALITY = 90
+# Stop searching once a fitting encode uses at least 90% of its budget
+VARIANT_BUDGET_TOLERANCE = 0.1
+
+
+def _avif_supported() -> bool:
+    # Pillow >= 11.3 ships AVIF; older builds warn and return False
+    try:
+        return features.check("avif")
+    except Exception:
+        return False
+
+
+VARIANT_FORMATS = {"webp": "WEBP"}
+if _avif_supported():
+    VARIANT_FORMATS["avif"] = "AVIF"
+
+WATERMARK_TEXT = "© EcoEaze · {farmer_name}"
+# Text height as a fraction of the image's shorter side
+WATERMARK_SCALE = 0.04
+WATERMARK_OPACITY = 160
+# Rendered overlays kept per worker, one per farmer name and image size
+WATERMARK_OVERLAY_CACHE_SIZE = int(os.getenv("WATERMARK_OVERLAY_CACHE_SIZE", 128))
+
+_ENCODER_OPTIONS = {
+    "WEBP": {"method": 4},
+    "AVIF": {"speed": 9},
+}
+
+
+# Generated outputs live in this subdirectory next to their upload. Uploads
+# never land there, so its location, not the file name, marks a file as ours.
+GENERATED_DIRNAME = "generated"
+
+
+def derived_path(image_path: str, suffix: str, ext: str = ".jpg") -> str:
+    """
+    Path for an output derived from image_path, e.g.
+    uploads/photo.png -> uploads/generated/photo_thumb_small.jpg
+    The generated directory is created if needed.
+    """
+    directory, name = os.path.split(image_path)
+    root, _ = os.path.splitext(name)
+    generated = os.path.join(directory, GENERATED_DIRNAME)
+    os.makedirs(generated, exist_ok=True)
+    return os.path.join(generated, f"{root}_{suffix}{ext}")
+
+
+def watermark_suffix(farmer_name: str) -> str:
+    """
+    derived_path() suffix for a farmer's watermarked copy. The name is
+    reduced to [A-Za-z0-9_-] so it can't add dots or path separators.
+    """
+    return "watermarked_" + re.sub(r"[^A-Za-z0-9_-]", "_", farmer_name)
+
+
+# Names derived_path() gives renditions, variants and watermarks. The greedy
+# first group takes the last suffix, so it is the upload's name without
+# extension.
+_DERIVED_NAME = re.compile(r"^(.*)_(optimized|thumb_[a-z]+|watermarked_[A-Za-z0-9_-]+)\.(jpg|webp|avif)$")
+
+
+def derived_source(path: str):
+    """
+    For one of our generated outputs, (directory, name without extension) of
+    the upload it was made from; None for anything else, including files
+    outside a generated directory whatever their name.
+    """
+    directory, filename = os.path.split(path)
+    if os.path.basename(directory) != GENERATED_DIRNAME:
+        return None
+    match = _DERIVED_NAME.match(filename)
+    return (os.path.dirname(directory), match.group(1)) if match else None
+
+
+def is_derived_image(path: str) -> bool:
+    """
+    Whether path is one of our generated outputs rather than an upload.
+    """
+    return derived_source(path) is not None
+
+
+def load_image(image_path: str, max_size: tuple = None) -> Image.Image:
+    """
+    Decode an image once, ready for resizing.
+
+    For JPEGs with max_size, the decoder's DCT scaling (draft mode) decodes
+    directly at 1/2, 1/4 or 1/8 scale when the image is much larger than
+    needed, which is far cheaper than a full decode followed by a resize.
+    EXIF orientation is applied and the result is RGB (or L).
+    """
+    img = Image.open(image_path)
+    if max_size and img.format == "JPEG":
+        img.draft("RGB", max_size)
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        # JPEG has no alpha; flatten transparency onto white
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return img
+
+
+def resize_within(img: Image.Image, size: tuple) -> Image.Image:
+    """
+    Copy of img scaled down to fit within size, keeping aspect ratio.
+    reducing_gap lets Pillow use a cheap integer reduce() before the final
+    Lanczos pass.
+    """
+    resized = img.copy()
+    resized.thumbnail(size, Image.LANCZOS, reducing_gap=3.0)
+    return resized
+
+
+def render_sizes(img: Image.Image, sizes: dict) -> dict:
+    """
+    Render every named size from one decoded image, largest first, each
+    one downscaled from the previous rendition rather than the original.
+    """
+    renditions = {}
+    source = img
+    for name, size in sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+        source = resize_within(source, size)
+        renditions[name] = source
+    return renditions
+
+
+def save_jpeg(img: Image.Image, path: str, quality: int = JPEG_QUALITY) -> int:
+    """
+    Save as an optimized progressive JPEG and return the file size in bytes.
+    """
+    img.save(path, "JPEG", quality=quality, optimize=True, progressive=True)
+    return os.path.getsize(path)
+
+
+def _encode(img: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, quality=quality, **_ENCODER_OPTIONS.get(image_format, {}))
+    return buffer.getvalue()
+
+
+def encode_to_budget(img: Image.Image, image_format: str, max_bytes: int,
+                     min_quality: int = VARIANT_MIN_QUALITY, max_quality: int = VARIANT_MAX_QUALITY,
+                     tolerance: float = VARIANT_BUDGET_TOLERANCE):
+    """
+    Search encoder quality for the highest quality whose output fits in
+    max_bytes. Returns (data, quality).
+
+    Encoded size grows roughly exponentially with quality, so each probe
+    interpolates log(size) between the current bracket ends instead of
+    bisecting; the search stops once a fitting encode is within `tolerance`
+    of the budget. If even min_quality is over budget, that smallest
+    encoding is returned.
+    """
+    high_data = _encode(img, image_format, max_quality)
+    if len(high_data) <= max_bytes:
+        return high_data, max_quality
+    low_data = _encode(img, image_format, min_quality)
+    if len(low_data) > max_bytes:
+        return low_data, min_quality
+
+    low, high = (min_quality, len(low_data)), (max_quality, len(high_data))
+    best = (low_data, min_quality)
+    while high[0] - low[0] > 1 and len(best[0]) < max_bytes * (1 - tolerance):
+        position = (math.log(max_bytes) - math.log(low[1])) / (math.log(high[1]) - math.log(low[1]))
+        quality = min(max(int(low[0] + position * (high[0] - low[0])), low[0] + 1), high[0] - 1)
+        data = _encode(img, image_format, quality)
+        if len(data) <= max_bytes:
+            low = (quality, len(data))
+            best = (data, quality)
+        else:
+            high = (quality, len(data))
+    return best
+
+
+def save_variants(img: Image.Image, image_path: str, suffix: str, max_bytes: int) -> dict:
+    """
+    Write every supported modern-format variant of a rendition within the
+    byte budget. Returns {format: {"path", "bytes", "quality"}}.
+    """
+    variants = {}
+    for ext, image_format in VARIANT_FORMATS.items():
+        data, quality = encode_to_budget(img, image_format, max_bytes)
+        path = derived_path(image_path, suffix, f".{ext}")
+        with open(path, "wb") as f:
+            f.write(data)
+        variants[ext] = {"path": path, "bytes": len(data), "quality": quality}
+    return variants
+
+
+def _watermark_font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=WATERMARK_OVERLAY_CACHE_SIZE)
+def watermark_overlay(farmer_name: str, image_size: tuple):
+    """
+    Render a farmer's watermark for an image of image_size once per worker.
+    Returns (patch, position): an RGBA patch just large enough for the text
+    and where to paste it (bottom-right corner). The patch is shared, so
+    callers must only read it.
+    """
+    width, height = image_size
+    text = WATERMARK_TEXT.format(farmer_name=farmer_name)
+    font = _watermark_font(max(12, int(min(width, height) * WATERMARK_SCALE)))
+    left, top, right, bottom = font.getbbox(text)
+    shadow = max(1, (bottom - top) // 12)
+    margin = max(4, (bottom - top) // 2)
+
+    patch = Image.new("RGBA", (right - left + shadow, bottom - top + shadow), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(patch)
+    draw.text((shadow - left, shadow - top), text, font=font, fill=(0, 0, 0, WATERMARK_OPACITY // 2))
+    draw.text((-left, -top), text, font=font, fill=(255, 255, 255, WATERMARK_OPACITY))
+    position = (max(0, width - patch.width - margin), max(0, height - patch.height - margin))
+    return patch, position
+
+
+def apply_watermark(img: Image.Image, farmer_name: str) -> Image.Image:
+    """
+    Blend the farmer's cached overlay into img in place and return it.
+    """
+    patch, position = watermark_overlay(farmer_name, img.size)
+    img.paste(patch, position, patch)
+    return img
@@ -0,0 +1,150 @@
+# src/tasks/imageQuality.py
+import numpy as np
+from PIL import Image
+from src.tasks.imagePipeline import load_image
+
+# Metrics are computed on a grayscale copy that fits in this box. JPEG draft
+# decoding makes producing it cheap, and a fixed scale keeps the blur measure
+# comparable across upload resolutions.
+ANALYSIS_MAX_SIZE = (512, 512)
+
+# Laplacian variance (on the analysis copy) at or above which an image counts as sharp
+SHARP_LAPLACIAN_VARIANCE = 300.0
+# Brightness targets on a 0-255 scale
+IDEAL_BRIGHTNESS = (90, 170)
+# Fraction of pixels at either end of the histogram before exposure is penalized
+MAX_CLIPPED_FRACTION = 0.05
+MIN_CONTRAST_STD = 40.0
+# Shorter side, in original pixels, needed for a crisp 1200px optimized image
+RECOMMENDED_MIN_SIDE = 800
+# Product cards are square-ish; long/short side ratios above this get cropped badly
+MAX_GOOD_ASPECT_RATIO = 1.5
+MAX_ASPECT_RATIO = 3.0
+
+QUALITY_WEIGHTS = {"sharpness": 40, "exposure": 30, "resolution": 20, "aspect": 10}
+
+# Everything that changes the score; part of the result cache key
+QUALITY_PARAMS = {
+    "analysis_max_size": ANALYSIS_MAX_SIZE,
+    "sharp_laplacian_variance": SHARP_LAPLACIAN_VARIANCE,
+    "ideal_brightness": IDEAL_BRIGHTNESS,
+    "max_clipped_fraction": MAX_CLIPPED_FRACTION,
+    "min_contrast_std": MIN_CONTRAST_STD,
+    "recommended_min_side": RECOMMENDED_MIN_SIDE,
+    "aspect_ratio": (MAX_GOOD_ASPECT_RATIO, MAX_ASPECT_RATIO),
+    "weights": QUALITY_WEIGHTS,
+}
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """
+    Variance of the 4-neighbour Laplacian; low values mean few edges (blur).
+    Images under 3 px on a side have no interior pixels and score 0.
+    """
+    if min(gray.shape) < 3:
+        return 0.0
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def exposure_stats(gray: np.ndarray) -> dict:
+    """
+    Brightness, contrast and clipping from the 256-bin luminance histogram.
+    """
+    histogram = np.bincount(gray.ravel().astype(np.uint8), minlength=256)
+    total = histogram.sum()
+    levels = np.arange(256)
+    mean = float((histogram * levels).sum() / total)
+    std = float(np.sqrt((histogram * (levels - mean) ** 2).sum() / total))
+    return {
+        "brightness": round(mean, 1),
+        "contrast": round(std, 1),
+        "shadows_clipped": round(float(histogram[:6].sum() / total), 4),
+        "highlights_clipped": round(float(histogram[250:].sum() / total), 4),
+    }
+
+
+def _exposure_score(exposure: dict) -> float:
+    low, high = IDEAL_BRIGHTNESS
+    brightness = exposure["brightness"]
+    if brightness < low:
+        score = brightness / low
+    elif brightness > high:
+        score = (255 - brightness) / (255 - high)
+    else:
+        score = 1.0
+    clipped = max(exposure["shadows_clipped"], exposure["highlights_clipped"])
+    if clipped > MAX_CLIPPED_FRACTION:
+        score *= max(0.0, 1 - (clipped - MAX_CLIPPED_FRACTION) * 2)
+    score *= min(exposure["contrast"] / MIN_CONTRAST_STD, 1.0)
+    return score
+
+
+def _aspect_score(ratio: float) -> float:
+    if ratio <= MAX_GOOD_ASPECT_RATIO:
+        return 1.0
+    return max(0.0, (MAX_ASPECT_RATIO - ratio) / (MAX_ASPECT_RATIO - MAX_GOOD_ASPECT_RATIO))
+
+
+def score_image(gray: np.ndarray, original_size: tuple) -> dict:
+    """
+    Score a grayscale analysis copy (float32 array) of an image whose original
+    dimensions are original_size. Returns the 0-100 quality score, each
+    metric and improvement suggestions.
+    """
+    sharpness = laplacian_variance(gray)
+    exposure = exposure_stats(gray)
+    short_side, long_side = sorted(original_size)
+    aspect_ratio = long_side / short_side if short_side else float("inf")
+
+    scores = {
+        "sharpness": min(sharpness / SHARP_LAPLACIAN_VARIANCE, 1.0),
+        "exposure": _exposure_score(exposure),
+        "resolution": min(short_side / RECOMMENDED_MIN_SIDE, 1.0),
+        "aspect": _aspect_score(aspect_ratio),
+    }
+    quality_score = round(sum(QUALITY_WEIGHTS[name] * score for name, score in scores.items()))
+
+    suggestions = []
+    if scores["sharpness"] < 0.5:
+        suggestions.append("Image appears blurry - consider retaking with better focus")
+    if exposure["brightness"] < IDEAL_BRIGHTNESS[0] or exposure["shadows_clipped"] > MAX_CLIPPED_FRACTION:
+        suggestions.append("Image is too dark - try natural lighting")
+    elif exposure["brightness"] > IDEAL_BRIGHTNESS[1] or exposure["highlights_clipped"] > MAX_CLIPPED_FRACTION:
+        suggestions.append("Image is overexposed - avoid direct sunlight or flash")
+    elif exposure["contrast"] < MIN_CONTRAST_STD:
+        suggestions.append("Consider adjusting brightness/contrast for better appeal")
+    if short_side < RECOMMENDED_MIN_SIDE:
+        suggestions.append("Image dimensions are small - use higher resolution photos")
+    if aspect_ratio > MAX_GOOD_ASPECT_RATIO:
+        suggestions.append("Image is very wide or tall - crop closer to square")
+
+    return {
+        "quality_score": quality_score,
+        "metrics": {
+            "sharpness": round(sharpness, 1),
+            **exposure,
+            "width": original_size[0],
+            "height": original_size[1],
+            "aspect_ratio": round(aspect_ratio, 2),
+            "scores": {name: round(score, 3) for name, score in scores.items()},
+        },
+        "suggestions": suggestions,
+    }
+
+
+def analyze_image(image_path: str) -> dict:
+    """
+    Decode a downscaled grayscale copy of the image and score it.
+    """
+    with Image.open(image_path) as header:
+        # Only the header is read here; size is before EXIF rotation, which
+        # doesn't matter for the orientation-independent metrics
+        original_size = header.size
+    img = load_image(image_path, max_size=ANALYSIS_MAX_SIZE)
+    img.thumbnail(ANALYSIS_MAX_SIZE, Image.BILINEAR, reducing_gap=2.0)
+    gray = np.asarray(img.convert("L"), dtype=np.float32)
+    return score_image(gray, original_size)
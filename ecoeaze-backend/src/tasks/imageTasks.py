@@ -1,10 +1,33 @@
 # src/tasks/imageTasks.py
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from celery import Celery
 from dotenv import load_dotenv
-import redis
+from src.tasks.celeryConfig import configure_app
+from src.tasks.imageCache import ImageResultCache, file_digest
+from src.tasks.imageCleanup import CleanupBudget, OrphanedDerivedFiles, delete_files, iter_expired_files
+from src.tasks.imageQuality import QUALITY_PARAMS, analyze_image
+from src.tasks.imagePipeline import (
+    JPEG_QUALITY,
+    OPTIMIZED_MAX_SIZE,
+    THUMBNAIL_SIZES,
+    VARIANT_BYTE_BUDGETS,
+    VARIANT_FORMATS,
+    VARIANT_MAX_QUALITY,
+    VARIANT_MIN_QUALITY,
+    apply_watermark,
+    derived_path,
+    derived_source,
+    load_image,
+    render_sizes,
+    save_jpeg,
+    save_variants,
+    watermark_suffix,
+)
+from src.tasks.redisPool import redis_manager, IMAGES_DB
 
 load_dotenv()
 
@@ -13,88 +36,164 @@ app = Celery(
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
 )
+configure_app(app)
+
+# Shared pooled Redis client for image processing tracking
+redis_client = redis_manager.client(IMAGES_DB)
+
+# Threads compositing watermarks within one task. Pillow releases the GIL
+# while decoding and encoding, but the cpu lane already runs one prefork
+# process per core (CELERY_CPU_CONCURRENCY), so by default each task gets
+# cores / processes threads: 1 when the lane runs one process per core
+_CPU_WORKER_PROCESSES = int(os.getenv("CELERY_CPU_CONCURRENCY", os.cpu_count() or 1))
+WATERMARK_THREADS = int(os.getenv("WATERMARK_THREADS", max(1, (os.cpu_count() or 1) // max(1, _CPU_WORKER_PROCESSES))))
+
+# Retention cleanup: multer's temporary uploads are removed outright, the
+# public upload dir only loses files in its generated/ directories whose
+# upload was deleted (never uploads, nor outputs a cached result still serves)
+IMAGE_TEMP_DIR = os.getenv("IMAGE_TEMP_DIR", "uploads")
+IMAGE_UPLOAD_DIR = os.getenv("IMAGE_UPLOAD_DIR", os.path.join("public", "uploads"))
+# Per-run budget; the nightly run must finish well inside its 2 AM window
+CLEANUP_MAX_SECONDS = float(os.getenv("IMAGE_CLEANUP_MAX_SECONDS", 45 * 60))
+CLEANUP_MAX_DELETES = int(os.getenv("IMAGE_CLEANUP_MAX_DELETES", 1_000_000))
+CLEANUP_MAX_DELETES_PER_SECOND = float(os.getenv("IMAGE_CLEANUP_MAX_DELETES_PER_SECOND", 1000))
+CLEANUP_CHECKPOINT_KEY = "image_cleanup:checkpoint"
+
+# Results keyed by input file hash, so re-uploaded photos skip processing
+result_cache = ImageResultCache(redis_client)
+
+
+def _render_params(sizes: dict) -> dict:
+    # Everything that changes the rendered output; part of the cache key
+    return {
+        "sizes": sizes,
+        "jpeg_quality": JPEG_QUALITY,
+        "budgets": {name: VARIANT_BYTE_BUDGETS[name] for name in sizes},
+        "formats": sorted(VARIANT_FORMATS),
+        "quality_range": [VARIANT_MIN_QUALITY, VARIANT_MAX_QUALITY],
+    }
+
+
+def _output_paths(outputs: dict) -> list:
+    return [variant["path"] for output in outputs.values() for variant in output["variants"].values()]
+
+
+def _render_product_image(image_path: str, include_optimized: bool = True):
+    """
+    Decode the upload once and write the optimized image (optionally) and
+    every thumbnail from that single decode. Each rendition is written as a
+    JPEG plus WebP/AVIF variants sized to its byte budget.
+
+    If identical bytes were already rendered with the same settings and those
+    files still exist, they are reused instead. Returns (outputs, cache_hit)
+    where outputs is {name: {"path", "width", "height", "bytes", "variants"}}.
+    """
+    sizes = dict(THUMBNAIL_SIZES)
+    if include_optimized:
+        sizes["optimized"] = OPTIMIZED_MAX_SIZE
+    
+    digest = file_digest(image_path)
+    params = _render_params(sizes)
+    cached = result_cache.get("render", digest, params)
+    if cached is not None:
+        return cached, True
+    
+    largest = max(sizes.values(), key=lambda size: size[0] * size[1])
+    
+    img = load_image(image_path, max_size=largest)
+    outputs = {}
+    for name, rendition in render_sizes(img, sizes).items():
+        suffix = name if name == "optimized" else f"thumb_{name}"
+        path = derived_path(image_path, suffix)
+        jpeg_bytes = save_jpeg(rendition, path)
+        variants = {"jpeg": {"path": path, "bytes": jpeg_bytes, "quality": JPEG_QUALITY}}
+        variants.update(save_variants(rendition, image_path, suffix, VARIANT_BYTE_BUDGETS[name]))
+        outputs[name] = {
+            "path": path,
+            "width": rendition.width,
+            "height": rendition.height,
+            "bytes": jpeg_bytes,
+            "variants": variants
+        }
+    
+    result_cache.put("render", digest, params, outputs, _output_paths(outputs))
+    return outputs, False
+
+
+def _thumbnails_result(product_id: str, image_path: str, outputs: dict) -> dict:
+    return {
+        "product_id": product_id,
+        "original_path": image_path,
+        "thumbnails": {name: outputs[name]["path"] for name in THUMBNAIL_SIZES},
+        "variants": {name: outputs[name]["variants"] for name in THUMBNAIL_SIZES},
+        "generated_at": datetime.utcnow().isoformat()
+    }
 
-# Initialize Redis client for image processing tracking
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=5,  # Use database 5 for image processing
-    decode_responses=True
-)
 
 @app.task(name="optimize_product_image")
 def optimize_product_image(image_path: str, product_id: str):
     """
     Optimize product image for web display.
-    In a real implementation, you would:
-    - Resize images to multiple dimensions
-    - Compress images
-    - Convert to web-friendly formats
+    The upload is decoded once and both the optimized image and the
+    small/medium/large thumbnails are produced from that decode, so a
+    separate generate_image_thumbnails run isn't needed.
     """
-    # Simulate image optimization
     print(f"[IMAGE OPTIMIZATION] Optimizing image for product {product_id}: {image_path}")
     
-    # In a real implementation, you would use libraries like PIL/Pillow:
-    # from PIL import Image
-    # img = Image.open(image_path)
-    # img.thumbnail((800, 600))  # Resize
-    # optimized_path = image_path.replace(".jpg", "_optimized.jpg")
-    # img.save(optimized_path, "JPEG", quality=85)
+    try:
+        original_bytes = os.path.getsize(image_path)
+        outputs, cache_hit = _render_product_image(image_path)
+    except Exception as e:
+        return {"success": False, "message": f"Failed to optimize image: {e}"}
     
-    # For now, we'll just simulate the process
-    import time
-    time.sleep(2)  # Simulate processing time
+    optimized = outputs["optimized"]
+    reduction = (1 - optimized["bytes"] / original_bytes) * 100 if original_bytes else 0
     
-    # Store processing result in Redis
     result = {
         "product_id": product_id,
         "original_path": image_path,
-        "optimized_path": image_path.replace(".jpg", "_optimized.jpg"),
+        "optimized_path": optimized["path"],
+        "width": optimized["width"],
+        "height": optimized["height"],
+        "original_bytes": original_bytes,
+        "optimized_bytes": optimized["bytes"],
         "processed_at": datetime.utcnow().isoformat(),
-        "file_size_reduction": "35%"  # Simulated
+        "file_size_reduction": f"{reduction:.0f}%",
+        "cache_hit": cache_hit,
+        # Chosen encodings per size and format: {size: {format: {path, bytes, quality}}}
+        "variants": {name: output["variants"] for name, output in outputs.items()}
     }
+    thumbnails_result = _thumbnails_result(product_id, image_path, outputs)
     
-    # Cache in Redis
     cache_key = f"image_processing:{product_id}"
-    redis_client.setex(cache_key, 3600, json.dumps(result))
-    
-    # Log to processing history
-    redis_client.lpush("image_processing_history", json.dumps(result))
+    with redis_manager.pipeline(IMAGES_DB) as pipe:
+        # Cache in Redis
+        pipe.setex(cache_key, 3600, json.dumps(result))
+        pipe.setex(f"image_thumbnails:{product_id}", 7200, json.dumps(thumbnails_result))
+        # Log to processing history
+        pipe.lpush("image_processing_history", json.dumps(result))
+        pipe.execute()
     
     return {
         "success": True,
-        "result": result
+        "result": {**result, "thumbnails": thumbnails_result["thumbnails"]}
     }
 
 
 @app.task(name="generate_image_thumbnails")
 def generate_image_thumbnails(image_path: str, product_id: str):
     """
-    Generate multiple thumbnail sizes for a product image.
+    Generate multiple thumbnail sizes for a product image:
+    small 150x150, medium 300x300 and large 600x600 bounding boxes.
     """
-    # Simulate thumbnail generation
     print(f"[THUMBNAIL GENERATION] Generating thumbnails for product {product_id}: {image_path}")
     
-    # In a real implementation, you would generate multiple sizes:
-    # - Small: 150x150
-    # - Medium: 300x300
-    # - Large: 600x600
+    try:
+        outputs, cache_hit = _render_product_image(image_path, include_optimized=False)
+    except Exception as e:
+        return {"success": False, "message": f"Failed to generate thumbnails: {e}"}
     
-    import time
-    time.sleep(1)  # Simulate processing time
-    
-    thumbnails = {
-        "small": image_path.replace(".jpg", "_thumb_small.jpg"),
-        "medium": image_path.replace(".jpg", "_thumb_medium.jpg"),
-        "large": image_path.replace(".jpg", "_thumb_large.jpg")
-    }
-    
-    result = {
-        "product_id": product_id,
-        "original_path": image_path,
-        "thumbnails": thumbnails,
-        "generated_at": datetime.utcnow().isoformat()
-    }
+    result = {**_thumbnails_result(product_id, image_path, outputs), "cache_hit": cache_hit}
     
     # Cache in Redis
     cache_key = f"image_thumbnails:{product_id}"
@@ -106,35 +205,52 @@ def generate_image_thumbnails(image_path: str, product_id: str):
     }
 
 
+def _watermark_image(image_path: str, farmer_name: str) -> str:
+    watermarked_path = derived_path(image_path, watermark_suffix(farmer_name))
+    img = apply_watermark(load_image(image_path), farmer_name)
+    save_jpeg(img, watermarked_path)
+    return watermarked_path
+
+
 @app.task(name="watermark_product_images")
 def watermark_product_images(image_paths: list, farmer_name: str):
     """
     Add watermark to product images.
+    The farmer's overlay is rendered once per image size and cached in the
+    worker; images are decoded, composited and encoded on a thread pool.
     """
-    # Simulate watermarking process
     print(f"[WATERMARKING] Adding watermark for {farmer_name} to {len(image_paths)} images")
     
-    import time
-    time.sleep(len(image_paths) * 0.5)  # Simulate processing time
+    workers = max(1, min(WATERMARK_THREADS, len(image_paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_watermark_image, image_path, farmer_name) for image_path in image_paths]
     
     watermarked_images = []
-    for image_path in image_paths:
-        watermarked_path = image_path.replace(".jpg", f"_watermarked_{farmer_name.replace(' ', '_')}.jpg")
-        watermarked_images.append(watermarked_path)
+    failed = []
+    with redis_manager.pipeline(IMAGES_DB) as pipe:
+        for image_path, future in zip(image_paths, futures):
+            try:
+                watermarked_path = future.result()
+            except Exception as e:
+                failed.append({"image_path": image_path, "error": str(e)})
+                continue
+            watermarked_images.append(watermarked_path)
+            
+            # Store in Redis
+            cache_key = f"watermarked_image:{os.path.basename(image_path)}"
+            pipe.setex(cache_key, 3600, watermarked_path)
         
-        # Store in Redis
-        cache_key = f"watermarked_image:{os.path.basename(image_path)}"
-        redis_client.setex(cache_key, 3600, watermarked_path)
-    
-    result = {
-        "farmer_name": farmer_name,
-        "original_images": image_paths,
-        "watermarked_images": watermarked_images,
-        "processed_at": datetime.utcnow().isoformat()
-    }
-    
-    # Log to history
-    redis_client.lpush("watermarking_history", json.dumps(result))
+        result = {
+            "farmer_name": farmer_name,
+            "original_images": image_paths,
+            "watermarked_images": watermarked_images,
+            "failed": failed,
+            "processed_at": datetime.utcnow().isoformat()
+        }
+        
+        # Log to history
+        pipe.lpush("watermarking_history", json.dumps(result))
+        pipe.execute()
     
     return {
         "success": True,
@@ -143,35 +259,66 @@ def watermark_product_images(image_paths: list, farmer_name: str):
 
 
 @app.task(name="cleanup_old_images")
-def cleanup_old_images(retention_days: int = 30):
+def cleanup_old_images(retention_days: int = 30, max_seconds: float = CLEANUP_MAX_SECONDS,
+                       max_deletes: int = CLEANUP_MAX_DELETES,
+                       max_deletes_per_second: float = CLEANUP_MAX_DELETES_PER_SECOND):
     """
     Clean up old temporary and processed images.
+    Temporary uploads older than retention_days are removed. In the public
+    upload dir only generated outputs (in generated/ directories) that old
+    are, and only once their upload is gone and no cached render still hands
+    them out.
+    Candidates are streamed from an os.scandir walk and
+    deleted in batches on a small thread pool, within a time, delete-count
+    and delete-rate budget. A run that hits its budget saves where it stopped
+    in Redis and the next run resumes from there.
     """
-    # In a real implementation, you would:
-    # - Scan directories for old files
-    # - Remove files older than retention_days
-    # - Update database records
-    
     print(f"[IMAGE CLEANUP] Cleaning up images older than {retention_days} days")
     
-    # Simulate cleanup process
-    import time
-    time.sleep(3)  # Simulate processing time
+    cutoff = time.time() - retention_days * 86400
+    budget = CleanupBudget(max_seconds, max_deletes, max_deletes_per_second)
     
-    # Get cleanup statistics from Redis (simulated)
-    processed_count = int(redis_client.get("images_processed_today") or 0)
-    cleaned_count = min(processed_count, 100)  # Simulate cleaning up to 100 images
+    try:
+        checkpoint = json.loads(redis_client.get(CLEANUP_CHECKPOINT_KEY) or "null")
+        orphaned = OrphanedDerivedFiles(derived_source, keep=result_cache.live_paths("render"))
+        targets = [(IMAGE_TEMP_DIR, None), (IMAGE_UPLOAD_DIR, orphaned)]
+        totals = {"expired": 0, "deleted": 0, "bytes_freed": 0, "errors": 0}
+        complete = True
+        for index, (root, match) in enumerate(targets):
+            if checkpoint and index < checkpoint["target"]:
+                continue
+            if not os.path.isdir(root):
+                continue
+            resume_after = tuple(checkpoint["position"]) if checkpoint and index == checkpoint["target"] else None
+            stats = delete_files(iter_expired_files(root, cutoff, match, resume_after), budget)
+            for key in totals:
+                totals[key] += stats[key]
+            if stats["position"] is not None:
+                complete = False
+                checkpoint = {"target": index, "position": list(stats["position"])}
+                break
+    except Exception as e:
+        return {"success": False, "message": f"Failed to clean up images: {e}"}
     
     result = {
         "retention_days": retention_days,
-        "images_processed": processed_count,
-        "images_cleaned": cleaned_count,
-        "space_freed_mb": cleaned_count * 0.5,  # Simulate 0.5 MB per image
+        "images_cleaned": totals["deleted"],
+        "delete_errors": totals["errors"],
+        "space_freed_mb": round(totals["bytes_freed"] / (1024 * 1024), 2),
+        "elapsed_seconds": round(budget.elapsed(), 2),
+        "complete": complete,
+        "resume_from": None if complete else checkpoint,
         "cleaned_at": datetime.utcnow().isoformat()
     }
     
-    # Log cleanup result
-    redis_client.lpush("cleanup_history", json.dumps(result))
+    with redis_manager.pipeline(IMAGES_DB) as pipe:
+        if complete:
+            pipe.delete(CLEANUP_CHECKPOINT_KEY)
+        else:
+            pipe.set(CLEANUP_CHECKPOINT_KEY, json.dumps(checkpoint))
+        # Log cleanup result
+        pipe.lpush("cleanup_history", json.dumps(result))
+        pipe.execute()
     
     return {
         "success": True,
@@ -179,46 +326,123 @@ def cleanup_old_images(retention_days: int = 30):
     }
 
 
+def _analyze_image_cached(image_path: str):
+    """
+    Quality analysis for one image, reusing an earlier analysis of identical
+    bytes. Returns (analysis, cache_hit).
+    """
+    digest = file_digest(image_path)
+    analysis = result_cache.get("quality", digest, QUALITY_PARAMS)
+    if analysis is not None:
+        return analysis, True
+    
+    analysis = analyze_image(image_path)
+    result_cache.put("quality", digest, QUALITY_PARAMS, analysis)
+    return analysis, False
+
+
+def _quality_result(product_id: str, image_path: str, analysis: dict, cache_hit: bool) -> dict:
+    return {
+        "product_id": product_id,
+        "image_path": image_path,
+        **analysis,
+        "cache_hit": cache_hit,
+        "analyzed_at": datetime.utcnow().isoformat()
+    }
+
+
 @app.task(name="analyze_image_quality")
 def analyze_image_quality(image_path: str, product_id: str):
     """
     Analyze image quality and provide improvement suggestions.
+    Scores sharpness (Laplacian variance), exposure (luminance histogram),
+    resolution and aspect ratio on a downscaled copy, so it is cheap enough
+    to run on every upload.
     """
-    # Simulate image quality analysis
     print(f"[IMAGE ANALYSIS] Analyzing quality for product {product_id}: {image_path}")
     
-    import time
-    time.sleep(1)  # Simulate processing time
+    try:
+        analysis, cache_hit = _analyze_image_cached(image_path)
+    except Exception as e:
+        return {"success": False, "message": f"Failed to analyze image: {e}"}
     
-    # Simulated analysis results
-    quality_score = 85  # Out of 100
-    suggestions = []
+    result = _quality_result(product_id, image_path, analysis, cache_hit)
     
-    if quality_score < 70:
-        suggestions.extend([
-            "Image appears blurry - consider retaking with better focus",
-            "Lighting could be improved - try natural lighting",
-            "Image dimensions are small - use higher resolution photos"
-        ])
-    elif quality_score < 90:
-        suggestions.append("Consider adjusting brightness/contrast for better appeal")
+    cache_key = f"image_quality:{product_id}"
+    with redis_manager.pipeline(IMAGES_DB) as pipe:
+        # Cache analysis result
+        pipe.setex(cache_key, 86400, json.dumps(result))  # Cache for 24 hours
+        # Store in quality reports
+        pipe.lpush("image_quality_reports", json.dumps(result))
+        pipe.execute()
     
-    result = {
-        "product_id": product_id,
-        "image_path": image_path,
-        "quality_score": quality_score,
-        "suggestions": suggestions,
-        "analyzed_at": datetime.utcnow().isoformat()
+    return {
+        "success": True,
+        "result": result
     }
+
+
+@app.task(name="analyze_image_quality_batch")
+def analyze_image_quality_batch(images: list, farmer_id: str = None, low_quality_threshold: int = 70):
+    """
+    Score a whole catalog in one task.
+    images: list of {"product_id", "image_path"} dicts or (product_id, image_path) pairs.
+    Per-product results are cached like analyze_image_quality; with farmer_id
+    a catalog summary is cached under image_quality_summary:{farmer_id}.
+    """
+    print(f"[IMAGE ANALYSIS] Analyzing {len(images)} images" + (f" for farmer {farmer_id}" if farmer_id else ""))
     
-    # Cache analysis result
-    cache_key = f"image_quality:{product_id}"
-    redis_client.setex(cache_key, 86400, json.dumps(result))  # Cache for 24 hours
+    results = []
+    failed = []
+    for image in images:
+        if isinstance(image, dict):
+            product_id, image_path = image["product_id"], image["image_path"]
+        else:
+            product_id, image_path = image
+        try:
+            analysis, cache_hit = _analyze_image_cached(image_path)
+        except Exception as e:
+            failed.append({"product_id": product_id, "image_path": image_path, "error": str(e)})
+            continue
+        results.append(_quality_result(product_id, image_path, analysis, cache_hit))
     
-    # Store in quality reports
-    redis_client.lpush("image_quality_reports", json.dumps(result))
+    scores = [result["quality_score"] for result in results]
+    summary = {
+        "farmer_id": farmer_id,
+        "images_analyzed": len(results),
+        "images_failed": len(failed),
+        "average_score": round(sum(scores) / len(scores), 1) if scores else None,
+        "low_quality": [
+            {"product_id": result["product_id"], "quality_score": result["quality_score"], "suggestions": result["suggestions"]}
+            for result in sorted(results, key=lambda result: result["quality_score"])
+            if result["quality_score"] < low_quality_threshold
+        ],
+        "failed": failed,
+        "analyzed_at": datetime.utcnow().isoformat()
+    }
+    
+    with redis_manager.pipeline(IMAGES_DB) as pipe:
+        for result in results:
+            pipe.setex(f"image_quality:{result['product_id']}", 86400, json.dumps(result))
+        if results:
+            pipe.lpush("image_quality_reports", *[json.dumps(result) for result in results])
+        if farmer_id:
+            pipe.setex(f"image_quality_summary:{farmer_id}", 86400, json.dumps(summary))
+        pipe.execute()
     
     return {
         "success": True,
-        "result": result
-    }
\ No newline at end of file
+        "summary": summary,
+        "results": results
+    }
+
+
+@app.task(name="get_image_cache_stats")
+def get_image_cache_stats():
+    """
+    Hit/miss/store/eviction counters and current size of the image result cache.
+    """
+    try:
+        return {"success": True, "stats": result_cache.stats()}
+    except Exception as e:
+        return {"success": False, "message": f"Failed to read image cache stats: {e}"}
@@ -0,0 +1,182 @@
+# src/tasks/inventorySeries.py
+import os
+import json
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from src.tasks.redisPool import redis_manager, INVENTORY_DB
+
+load_dotenv()
+
+# Stock level history per product, kept in tiers so months of history fit in
+# bounded memory:
+#   raw     inventory_movement:{id}              ZSET  every change (JSON), last RAW_WINDOW
+#   minute  inventory_series:{id}:m:{YYYYMMDDHH}  HASH  "{MM}" -> "min:max:last"
+#   hour    inventory_series:{id}:h:{YYYYMMDD}    HASH  "{HH}" -> "min:max:last"
+#   day     inventory_series:{id}:d:{YYYYMM}      HASH  "{DD}" -> "min:max:last"
+# Every change updates its raw entry and its minute, hour and day buckets at
+# once, so no compaction job is needed; each tier's hashes simply expire after
+# that tier's retention. Buckets only exist where the stock changed; the level
+# in between is the previous bucket's last.
+RAW_WINDOW_SECONDS = int(os.getenv("INVENTORY_RAW_WINDOW", 6 * 3600))
+MOVEMENT_HISTORY_LIMIT = 1000  # Safety cap on raw changes per product
+
+TIERS = (
+    # name, bucket seconds, retention seconds, container format, field format
+    ("minute", 60, int(os.getenv("INVENTORY_MINUTE_RETENTION", 2 * 86400)), "%Y%m%d%H", "%M"),
+    ("hour", 3600, int(os.getenv("INVENTORY_HOUR_RETENTION", 90 * 86400)), "%Y%m%d", "%H"),
+    ("day", 86400, int(os.getenv("INVENTORY_DAY_RETENTION", 730 * 86400)), "%Y%m", "%d"),
+)
+# Range queries use the finest tier that covers the range in at most this many buckets
+DEFAULT_MAX_POINTS = 500
+
+redis_client = redis_manager.client(INVENTORY_DB)
+
+_RECORD_BUCKETS_LUA = """
+local value = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local field = ARGV[2 * i]
+    local low, high = value, value
+    local current = redis.call('HGET', key, field)
+    if current then
+        local old_low, old_high = string.match(current, '^([^:]+):([^:]+):')
+        low = math.min(tonumber(old_low), value)
+        high = math.max(tonumber(old_high), value)
+    end
+    redis.call('HSET', key, field, low .. ':' .. high .. ':' .. ARGV[1])
+    redis.call('EXPIRE', key, ARGV[2 * i + 1])
+end
+return #KEYS
+"""
+
+_record_buckets = redis_client.register_script(_RECORD_BUCKETS_LUA)
+
+
+def movement_key(product_id: str) -> str:
+    return f"inventory_movement:{product_id}"
+
+
+def _tier_key(product_id: str, tier: str, container: str) -> str:
+    return f"inventory_series:{product_id}:{tier[0]}:{container}"
+
+
+def queue_movement(pipe, product_id: str, quantity: int, now: datetime):
+    """
+    Queue the raw record and the minute/hour/day bucket updates for one stock
+    change on a pipeline.
+    """
+    score = now.timestamp()
+    key = movement_key(product_id)
+    movement_record = {
+        "product_id": product_id,
+        "quantity": quantity,
+        "timestamp": score
+    }
+    pipe.zadd(key, {json.dumps(movement_record): score})
+    pipe.zremrangebyscore(key, "-inf", score - RAW_WINDOW_SECONDS)
+    pipe.zremrangebyrank(key, 0, -(MOVEMENT_HISTORY_LIMIT + 1))
+    pipe.expire(key, RAW_WINDOW_SECONDS)
+
+    keys, args = [], [quantity]
+    for tier, _, retention, container_format, field_format in TIERS:
+        keys.append(_tier_key(product_id, tier, now.strftime(container_format)))
+        args += [now.strftime(field_format), retention]
+    _record_buckets(keys=keys, args=args, client=pipe)
+
+
+def _containers(tier: str, start: datetime, end: datetime) -> list:
+    """
+    Every container period (hour / day / month start) overlapping [start, end].
+    """
+    if tier == "minute":
+        current = start.replace(minute=0, second=0, microsecond=0)
+        step = lambda moment: moment + timedelta(hours=1)
+    elif tier == "hour":
+        current = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        step = lambda moment: moment + timedelta(days=1)
+    else:
+        current = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        step = lambda moment: (moment + timedelta(days=32)).replace(day=1)
+    containers = []
+    while current <= end:
+        containers.append(current)
+        current = step(current)
+    return containers
+
+
+def _bucket_start(tier: str, container: datetime, field: str) -> datetime:
+    if tier == "minute":
+        return container.replace(minute=int(field))
+    if tier == "hour":
+        return container.replace(hour=int(field))
+    return container.replace(day=int(field))
+
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _read_raw(product_id: str, start: datetime, end: datetime) -> list:
+    members = redis_client.zrangebyscore(movement_key(product_id), start.timestamp(), end.timestamp())
+    points = []
+    for member in members:
+        record = json.loads(member)
+        quantity = record["quantity"]
+        points.append({
+            "timestamp": datetime.fromtimestamp(record["timestamp"]).isoformat(),
+            "min": quantity,
+            "max": quantity,
+            "last": quantity
+        })
+    return points
+
+
+def _read_tier(product_id: str, tier: str, start: datetime, end: datetime) -> list:
+    containers = _containers(tier, start, end)
+    container_format = next(entry[3] for entry in TIERS if entry[0] == tier)
+    with redis_manager.pipeline(INVENTORY_DB) as pipe:
+        for container in containers:
+            pipe.hgetall(_tier_key(product_id, tier, container.strftime(container_format)))
+        buckets = pipe.execute()
+
+    bucket_seconds = next(entry[1] for entry in TIERS if entry[0] == tier)
+    points = []
+    for container, fields in zip(containers, buckets):
+        for field, value in sorted(fields.items()):
+            moment = _bucket_start(tier, container, field)
+            if moment + timedelta(seconds=bucket_seconds) <= start or moment > end:
+                continue
+            low, high, last = (_number(part) for part in value.split(":"))
+            points.append({"timestamp": moment.isoformat(), "min": low, "max": high, "last": last})
+    return points
+
+
+def pick_tier(product_id: str, start: datetime, end: datetime, now: datetime = None,
+              max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """
+    Finest tier whose retention reaches back to start and that returns at most
+    max_points points for the range; falls back to "day".
+    """
+    now = now or datetime.utcnow()
+    if start >= now - timedelta(seconds=RAW_WINDOW_SECONDS):
+        if redis_client.zcount(movement_key(product_id), start.timestamp(), end.timestamp()) <= max_points:
+            return "raw"
+    span = (end - start).total_seconds()
+    for tier, bucket_seconds, retention, _, _ in TIERS:
+        if start >= now - timedelta(seconds=retention) and span / bucket_seconds <= max_points:
+            return tier
+    return "day"
+
+
+def stock_history(product_id: str, start: datetime, end: datetime = None, tier: str = None,
+                  max_points: int = DEFAULT_MAX_POINTS) -> dict:
+    """
+    Stock levels for a product between start and end (naive UTC), from the
+    given tier or the one pick_tier() chooses. Points are oldest first, each
+    with the bucket start and the min/max/last level in that bucket (raw
+    points have min == max == last).
+    """
+    end = end or datetime.utcnow()
+    tier = tier or pick_tier(product_id, start, end, max_points=max_points)
+    points = _read_raw(product_id, start, end) if tier == "raw" else _read_tier(product_id, tier, start, end)
+    return {"product_id": product_id, "tier": tier, "points": points}
@@ -1,10 +1,15 @@
 # src/tasks/inventoryTasks.py
 import os
 import json
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from celery import Celery
 from dotenv import load_dotenv
-import redis
+import numpy as np
+from src.tasks.celeryConfig import configure_app
+from src.tasks.redisPool import redis_manager, INVENTORY_DB
+from src.tasks import inventorySeries, salesRollups
+from src.tasks.notificationTasks import send_push_notification
 
 load_dotenv()
 
@@ -13,52 +18,99 @@ app = Celery(
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
 )
+configure_app(app)
 
-# Initialize Redis client for inventory tracking
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=4,  # Use database 4 for inventory
-    decode_responses=True
-)
+# Shared pooled Redis client for inventory tracking
+redis_client = redis_manager.client(INVENTORY_DB)
 
 @app.task(name="low_stock_alert")
-def low_stock_alert(farmerId: str, productId: str, currentStock: int):
+def low_stock_alert(farmerId: str, productId: str = None, currentStock: int = None, products: list = None):
     """
-    Triggered when product stock is low.
-    Node calls enqueueCeleryTask("low_stock_alert", {...})
-
-    Here you can:
-      - send email
-      - send SMS
-      - push notification, etc.
-    For now, we'll just log/print.
+    Notify a farmer that stock is low, in one push notification.
+    check_low_stock_periodic passes every low product of the farmer as
+    products ([{"product_id", "name", "current_stock", "threshold"}]); Node
+    still calls enqueueCeleryTask("low_stock_alert", {...}) for a single
+    productId/currentStock.
     """
-    print(
-        f"[LOW STOCK ALERT] Farmer: {farmerId}, Product: {productId}, Stock: {currentStock}"
-    )
-
-    # TODO: integrate with send_email / SMS provider if needed
+    if products is None:
+        products = [{"product_id": productId, "current_stock": currentStock}]
+    
+    lines = [
+        f"{product.get('name') or product['product_id']}: {product['current_stock']} left"
+        for product in products
+    ]
+    title = "Low stock alert" if len(products) == 1 else f"Low stock alert: {len(products)} products"
+    send_push_notification(farmerId, title, "\n".join(lines), {"type": "low_stock", "products": products})
+    
     return {
         "success": True,
         "farmerId": farmerId,
-        "productId": productId,
-        "currentStock": currentStock,
+        "products": len(products)
     }
 
 
 @app.task(name="check_low_stock_periodic")
 def check_low_stock_periodic():
     """
-    Example periodic task (for celery beat):
-    You could scan your DB (via Node API) for products with low stock and
-    then call low_stock_alert for each.
-
-    This is just a stub for now.
+    Hourly (celery beat): find every product below its low-stock threshold
+    with one ZRANGEBYSCORE on the headroom index, then send one
+    low_stock_alert per farmer. Cost follows the number of low products, not
+    the catalog size. A product is alerted again once its cooldown expires,
+    or as soon as it drops low again after a restock.
     """
-    # TODO: call backend API to get low-stock products and send alerts
-    print("[INVENTORY] Running periodic low stock check...")
-    return {"success": True}
+    try:
+        low_products = redis_client.zrangebyscore(STOCK_HEADROOM_KEY, "-inf", "(0", withscores=True)
+        if not low_products:
+            return {"success": True, "low_stock_products": 0, "farmers_alerted": 0}
+        
+        with redis_manager.pipeline(INVENTORY_DB) as pipe:
+            for product_id, _ in low_products:
+                pipe.hget(STOCK_THRESHOLDS_KEY, product_id)
+                pipe.get(f"product_info:{product_id}")
+            replies = pipe.execute()
+        
+        candidates = []
+        without_farmer = 0
+        for (product_id, headroom), threshold, info in zip(low_products, replies[0::2], replies[1::2]):
+            product_info = json.loads(info) if info else {}
+            farmer_id = product_info.get("farmer_id")
+            if not farmer_id:
+                without_farmer += 1
+                continue
+            threshold = int(threshold) if threshold is not None else LOW_STOCK_THRESHOLD
+            candidates.append((farmer_id, {
+                "product_id": product_id,
+                "name": product_info.get("name"),
+                "current_stock": int(headroom) + threshold,
+                "threshold": threshold
+            }))
+        
+        # Start each product's cooldown; products still cooling down are skipped
+        with redis_manager.pipeline(INVENTORY_DB) as pipe:
+            for _, product in candidates:
+                pipe.set(_low_stock_alerted_key(product["product_id"]), 1, nx=True,
+                         ex=LOW_STOCK_ALERT_COOLDOWN_SECONDS)
+            first_alerts = pipe.execute()
+        
+        by_farmer = defaultdict(list)
+        for (farmer_id, product), first_alert in zip(candidates, first_alerts):
+            if first_alert:
+                by_farmer[farmer_id].append(product)
+        already_alerted = len(candidates) - sum(len(products) for products in by_farmer.values())
+        
+        for farmer_id, products in by_farmer.items():
+            low_stock_alert.delay(farmer_id, products=products)
+        
+        return {
+            "success": True,
+            "low_stock_products": len(low_products),
+            "farmers_alerted": len(by_farmer),
+            "already_alerted": already_alerted,
+            "without_farmer": without_farmer
+        }
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to check low stock: {e}"}
 
 
 @app.task(name="auto_reorder_stock")
@@ -67,13 +119,11 @@ def auto_reorder_stock(product_id: str, farmer_id: str, current_stock: int, min_
     Automatically reorder stock when it falls below minimum level.
     """
     # Check if we've already triggered a reorder for this product recently
+    # The flag is set atomically (SET NX) so concurrent workers can't both reorder
     reorder_key = f"reorder_triggered:{product_id}"
-    if redis_client.exists(reorder_key):
+    if not redis_client.set(reorder_key, "true", ex=24 * 60 * 60, nx=True):
         return {"success": False, "message": "Reorder already triggered recently"}
     
-    # Set a flag to prevent duplicate reorders (expires in 24 hours)
-    redis_client.setex(reorder_key, 24 * 60 * 60, "true")
-    
     # Log the reorder event
     reorder_event = {
         "product_id": product_id,
@@ -101,90 +151,360 @@ def auto_reorder_stock(product_id: str, farmer_id: str, current_stock: int, min_
     }
 
 
-@app.task(name="update_inventory_cache")
-def update_inventory_cache(product_id: str, new_quantity: int):
+STOCK_CACHE_TTL_SECONDS = 300  # Cache stock levels for 5 minutes
+BULK_UPDATE_CHANGES_PER_PIPELINE = 500
+
+
+def _farmer_products_key(farmer_id: str) -> str:
+    # Secondary index: farmer -> ids of the products they sell
+    return f"farmer_products:{farmer_id}"
+
+
+# --- Low-stock index -----------------------------------------------------------
+#
+#   stock_thresholds  HASH  product id -> low-stock threshold (LOW_STOCK_THRESHOLD if unset)
+#   stock_headroom    ZSET  product id scored by current stock - threshold
+#   low_stock_alerted:{product_id}  set while an alert is cooling down
+# A product is low when its headroom is negative, so products below their
+# own thresholds are one ZRANGEBYSCORE away. Both scripts keep the headroom
+# consistent with whichever of stock and threshold changes, and
+# remove_product_inventory drops a deleted product from all three.
+
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 10))
+LOW_STOCK_ALERT_COOLDOWN_SECONDS = int(os.getenv("LOW_STOCK_ALERT_COOLDOWN", 24 * 60 * 60))
+STOCK_THRESHOLDS_KEY = "stock_thresholds"
+STOCK_HEADROOM_KEY = "stock_headroom"
+
+_INDEX_STOCK_LUA = """
+local threshold = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or ARGV[3])
+local headroom = tonumber(ARGV[2]) - threshold
+redis.call('ZADD', KEYS[2], headroom, ARGV[1])
+if headroom >= 0 then
+    redis.call('DEL', KEYS[3])
+end
+return headroom
+"""
+
+_SET_THRESHOLD_LUA = """
+local old = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or ARGV[3])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+local headroom = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if headroom then
+    redis.call('ZADD', KEYS[2], tonumber(headroom) + old - tonumber(ARGV[2]), ARGV[1])
+end
+return 1
+"""
+
+_index_stock = redis_client.register_script(_INDEX_STOCK_LUA)
+_set_threshold = redis_client.register_script(_SET_THRESHOLD_LUA)
+
+
+def _low_stock_alerted_key(product_id: str) -> str:
+    return f"low_stock_alerted:{product_id}"
+
+
+def _queue_threshold_update(pipe, product_id: str, threshold: int):
+    _set_threshold(keys=[STOCK_THRESHOLDS_KEY, STOCK_HEADROOM_KEY],
+                   args=[product_id, int(threshold), LOW_STOCK_THRESHOLD], client=pipe)
+
+
+def _queue_stock_update(pipe, product_id: str, new_quantity: int, now: datetime = None,
+                        farmer_id: str = None):
     """
-    Update inventory cache in Redis when stock levels change.
+    Queue every write for one stock change on a pipeline.
+    A single clock read is used so the published timestamp, the raw movement
+    record and the history buckets all agree. When the owning farmer is known
+    the product is also added to the farmer's product index.
     """
-    # Update the main inventory cache
+    now = now or datetime.utcnow()
+    
     cache_key = f"product_stock:{product_id}"
-    redis_client.setex(cache_key, 300, str(new_quantity))  # Cache for 5 minutes
     
-    # Publish to Redis pub/sub for real-time updates
     update_message = {
         "product_id": product_id,
         "new_quantity": new_quantity,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": now.isoformat()
     }
     
-    redis_client.publish("inventory_updates", json.dumps(update_message))
+    # Update the main inventory cache
+    pipe.setex(cache_key, STOCK_CACHE_TTL_SECONDS, str(new_quantity))
+    # Publish to Redis pub/sub for real-time updates
+    pipe.publish("inventory_updates", json.dumps(update_message))
+    # Raw movement plus minute/hour/day history buckets
+    inventorySeries.queue_movement(pipe, product_id, new_quantity, now)
+    # Headroom below the product's low-stock threshold
+    _index_stock(keys=[STOCK_THRESHOLDS_KEY, STOCK_HEADROOM_KEY, _low_stock_alerted_key(product_id)],
+                 args=[product_id, new_quantity, LOW_STOCK_THRESHOLD], client=pipe)
+    if farmer_id:
+        pipe.sadd(_farmer_products_key(farmer_id), product_id)
+
+
+@app.task(name="update_inventory_cache")
+def update_inventory_cache(product_id: str, new_quantity: int, farmer_id: str = None):
+    """
+    Update inventory cache in Redis when stock levels change.
+    """
+    with redis_manager.pipeline(INVENTORY_DB, transaction=True) as pipe:
+        _queue_stock_update(pipe, product_id, new_quantity, farmer_id=farmer_id)
+        pipe.execute()
     
-    # Track inventory movement
-    movement_record = {
+    return {
+        "success": True,
         "product_id": product_id,
-        "quantity": new_quantity,
-        "timestamp": datetime.utcnow().timestamp()
+        "new_quantity": new_quantity
+    }
+
+
+@app.task(name="bulk_update_inventory_cache")
+def bulk_update_inventory_cache(changes: list):
+    """
+    Apply many stock changes in one task, e.g. a restock import.
+
+    changes is a list of [product_id, new_quantity(, farmer_id)] items or
+    {"product_id": ..., "new_quantity": ..., "farmer_id": ...} dicts. Each
+    chunk of changes is applied atomically (MULTI/EXEC) in a single round trip.
+    """
+    updates = []
+    for change in changes:
+        if isinstance(change, dict):
+            product_id = change.get("product_id")
+            new_quantity = change.get("new_quantity", change.get("quantity"))
+            farmer_id = change.get("farmer_id")
+        else:
+            product_id, new_quantity, *rest = change
+            farmer_id = rest[0] if rest else None
+        updates.append((product_id, int(new_quantity), farmer_id))
+    
+    for start in range(0, len(updates), BULK_UPDATE_CHANGES_PER_PIPELINE):
+        with redis_manager.pipeline(INVENTORY_DB, transaction=True) as pipe:
+            for product_id, new_quantity, farmer_id in updates[start:start + BULK_UPDATE_CHANGES_PER_PIPELINE]:
+                _queue_stock_update(pipe, product_id, new_quantity, farmer_id=farmer_id)
+            pipe.execute()
+    
+    return {
+        "success": True,
+        "updated_products": len(updates)
     }
+
+
+def _parse_utc(timestamp: str) -> datetime:
+    """
+    Naive UTC datetime for an ISO string; offsets (including "Z") are converted.
+    """
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@app.task(name="get_stock_history")
+def get_stock_history(product_id: str, start: str = None, end: str = None, tier: str = None,
+                      max_points: int = inventorySeries.DEFAULT_MAX_POINTS):
+    """
+    Stock level history for charts. start/end are ISO UTC timestamps (default:
+    the last 24 hours); the raw/minute/hour/day tier is picked from the range
+    unless given.
+    """
+    try:
+        end_time = _parse_utc(end) if end else datetime.utcnow()
+        start_time = _parse_utc(start) if start else end_time - timedelta(days=1)
+        if tier not in (None, "raw", *(entry[0] for entry in inventorySeries.TIERS)):
+            return {"success": False, "message": f"Unknown tier: {tier}"}
+        
+        return {
+            "success": True,
+            **inventorySeries.stock_history(product_id, start_time, end_time, tier=tier, max_points=max_points)
+        }
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to load stock history: {e}"}
+
+
+@app.task(name="update_product_info")
+def update_product_info(product_id: str, product_info: dict):
+    """
+    Cache product details used by inventory reports and keep the
+    farmer -> products index in step, moving the product if its farmer changed.
+    A low_stock_threshold in product_info sets the product's alert threshold.
+    """
+    product_info_key = f"product_info:{product_id}"
+    farmer_id = product_info.get("farmer_id")
     
-    # Store in sorted set for time-series analysis
-    movement_key = f"inventory_movement:{product_id}"
-    redis_client.zadd(movement_key, {json.dumps(movement_record): datetime.utcnow().timestamp()})
+    def _update(pipe):
+        previous = pipe.get(product_info_key)
+        previous_farmer_id = json.loads(previous).get("farmer_id") if previous else None
+        
+        pipe.multi()
+        pipe.set(product_info_key, json.dumps(product_info))
+        if previous_farmer_id and previous_farmer_id != farmer_id:
+            pipe.srem(_farmer_products_key(previous_farmer_id), product_id)
+        if farmer_id:
+            pipe.sadd(_farmer_products_key(farmer_id), product_id)
+        if product_info.get("low_stock_threshold") is not None:
+            _queue_threshold_update(pipe, product_id, product_info["low_stock_threshold"])
     
-    # Keep only last 1000 movements
-    redis_client.zremrangebyrank(movement_key, 0, -1001)
+    redis_manager.transaction(INVENTORY_DB, _update, product_info_key)
     
     return {
         "success": True,
         "product_id": product_id,
-        "new_quantity": new_quantity
+        "farmer_id": farmer_id
     }
 
 
-@app.task(name="generate_inventory_report")
-def generate_inventory_report(farmer_id: str = None):
+@app.task(name="set_low_stock_threshold")
+def set_low_stock_threshold(product_id: str, threshold: int):
     """
-    Generate inventory report for a farmer or all farmers.
+    Set the stock level below which a product counts as low.
     """
-    try:
-        # In a real implementation, you would fetch this data from your database
-        # For now, we'll simulate with Redis data
+    with redis_manager.pipeline(INVENTORY_DB, transaction=True) as pipe:
+        _queue_threshold_update(pipe, product_id, threshold)
+        pipe.execute()
+    
+    return {"success": True, "product_id": product_id, "threshold": int(threshold)}
+
+
+@app.task(name="remove_product_inventory")
+def remove_product_inventory(product_id: str):
+    """
+    Forget a deleted product: its cached stock and info, its entry in the
+    farmer's product index and in the low-stock index, threshold and alert
+    cooldown. Stock history is left to expire with its tiers.
+    """
+    product_info_key = f"product_info:{product_id}"
+    
+    def _remove(pipe):
+        previous = pipe.get(product_info_key)
+        farmer_id = json.loads(previous).get("farmer_id") if previous else None
         
-        # Get all product stock levels from cache
-        pattern = "product_stock:*"
-        keys = redis_client.keys(pattern)
+        pipe.multi()
+        pipe.delete(product_info_key, f"product_stock:{product_id}", _low_stock_alerted_key(product_id))
+        if farmer_id:
+            pipe.srem(_farmer_products_key(farmer_id), product_id)
+        pipe.zrem(STOCK_HEADROOM_KEY, product_id)
+        pipe.hdel(STOCK_THRESHOLDS_KEY, product_id)
+    
+    redis_manager.transaction(INVENTORY_DB, _remove, product_info_key)
+    
+    return {"success": True, "product_id": product_id}
+
+
+REPORT_SCAN_BATCH_SIZE = 1000
+HIGH_STOCK_LEVEL = 50
+
+
+def _stock_status(stock_level: int, threshold: int = LOW_STOCK_THRESHOLD) -> str:
+    return "Low Stock" if stock_level < threshold else "Adequate" if stock_level < HIGH_STOCK_LEVEL else "High Stock"
+
+
+def _batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_product_ids(farmer_id: str = None, batch_size: int = REPORT_SCAN_BATCH_SIZE):
+    """
+    Yield product ids in batches. Farmer-scoped iteration reads only the
+    farmer's product index; otherwise stock keys are walked with SCAN (never
+    KEYS, which blocks Redis on large keyspaces). Either scan may return an id
+    twice if the keyspace is resized mid-scan.
+    """
+    if farmer_id:
+        product_ids = redis_client.sscan_iter(_farmer_products_key(farmer_id), count=batch_size)
+    else:
+        stock_keys = redis_client.scan_iter(match="product_stock:*", count=batch_size)
+        product_ids = (key.split(":", 1)[1] for key in stock_keys)
+    return _batched(product_ids, batch_size)
+
+
+def _iter_inventory_rows(farmer_id: str = None, batch_size: int = REPORT_SCAN_BATCH_SIZE):
+    """
+    Yield one report row per cached product.
+
+    Each batch of ids fetches stock levels, product info and low-stock
+    thresholds with two MGETs and an HMGET in a single round trip. Products
+    whose stock key has expired are skipped, as are indexed products whose
+    info now names another farmer.
+    """
+    for product_ids in _iter_product_ids(farmer_id, batch_size):
+        with redis_manager.pipeline(INVENTORY_DB) as pipe:
+            pipe.mget([f"product_stock:{product_id}" for product_id in product_ids])
+            pipe.mget([f"product_info:{product_id}" for product_id in product_ids])
+            pipe.hmget(STOCK_THRESHOLDS_KEY, product_ids)
+            stock_levels, product_infos, thresholds = pipe.execute()
         
-        inventory_data = []
-        for key in keys:
-            product_id = key.split(":")[1]
-            stock_level = int(redis_client.get(key) or 0)
+        for product_id, stock_level, product_info, threshold in zip(product_ids, stock_levels, product_infos,
+                                                                     thresholds):
+            if stock_level is None:
+                continue
             
-            # Get product details from another cache (simulated)
-            product_info_key = f"product_info:{product_id}"
-            product_info = redis_client.get(product_info_key)
+            product_info = json.loads(product_info) if product_info else {}
+            if farmer_id and product_info.get("farmer_id", farmer_id) != farmer_id:
+                continue
             
-            inventory_data.append({
+            stock_level = int(stock_level)
+            threshold = int(threshold) if threshold is not None else LOW_STOCK_THRESHOLD
+            yield {
                 "product_id": product_id,
                 "stock_level": stock_level,
-                "product_info": json.loads(product_info) if product_info else {},
-                "status": "Low Stock" if stock_level < 10 else "Adequate" if stock_level < 50 else "High Stock"
-            })
-        
-        # Filter by farmer if specified
-        if farmer_id:
-            inventory_data = [item for item in inventory_data if item.get("product_info", {}).get("farmer_id") == farmer_id]
+                "product_info": product_info,
+                "low_stock_threshold": threshold,
+                "status": _stock_status(stock_level, threshold)
+            }
+
+
+def _write_inventory_report(path: str, rows, header: dict) -> dict:
+    """
+    Stream rows into a JSON report file and return the summary counts.
+    Rows are written one per line as they arrive; the totals follow the
+    inventory_details array since they are only known at the end.
+    """
+    summary = {
+        "total_products": 0,
+        "low_stock_items": 0,
+        "adequate_stock_items": 0,
+        "high_stock_items": 0
+    }
+    status_counters = {
+        "Low Stock": "low_stock_items",
+        "Adequate": "adequate_stock_items",
+        "High Stock": "high_stock_items"
+    }
+    
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value)},\n")
+        f.write('  "inventory_details": [')
         
-        # Generate report
-        report_data = {
-            "generated_at": datetime.utcnow().isoformat(),
-            "farmer_id": farmer_id,
-            "total_products": len(inventory_data),
-            "low_stock_items": len([item for item in inventory_data if item["status"] == "Low Stock"]),
-            "adequate_stock_items": len([item for item in inventory_data if item["status"] == "Adequate"]),
-            "high_stock_items": len([item for item in inventory_data if item["status"] == "High Stock"]),
-            "inventory_details": inventory_data
-        }
+        for row in rows:
+            f.write("\n    " if summary["total_products"] == 0 else ",\n    ")
+            f.write(json.dumps(row))
+            summary["total_products"] += 1
+            summary[status_counters[row["status"]]] += 1
         
-        # Save report
+        f.write("\n  ]" if summary["total_products"] else "]")
+        for key, value in summary.items():
+            f.write(f",\n  {json.dumps(key)}: {json.dumps(value)}")
+        f.write("\n}\n")
+    
+    return summary
+
+
+@app.task(name="generate_inventory_report")
+def generate_inventory_report(farmer_id: str = None):
+    """
+    Generate inventory report for a farmer or all farmers.
+    """
+    try:
+        # In a real implementation, you would fetch this data from your database
+        # For now, we'll simulate with Redis data
         reports_dir = os.getenv("REPORTS_DIR", "reports")
         os.makedirs(reports_dir, exist_ok=True)
         
@@ -192,19 +512,23 @@ def generate_inventory_report(farmer_id: str = None):
         filename = f"inventory_report_{farmer_id or 'all'}_{timestamp}.json"
         path = os.path.join(reports_dir, filename)
         
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(report_data, f, indent=2)
+        header = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "farmer_id": farmer_id
+        }
+        summary = _write_inventory_report(path, _iter_inventory_rows(farmer_id), header)
         
-        # Cache in Redis for quick access
+        # Cache the summary in Redis for quick access; the details live in the report file
         cache_key = f"inventory_report:{farmer_id or 'all'}"
-        redis_client.setex(cache_key, 3600, json.dumps(report_data))  # Cache for 1 hour
+        cached_report = {**header, **summary, "report_path": path}
+        redis_client.setex(cache_key, 3600, json.dumps(cached_report))  # Cache for 1 hour
         
         return {
             "success": True,
             "report_path": path,
             "summary": {
-                "total_products": report_data["total_products"],
-                "low_stock_items": report_data["low_stock_items"]
+                "total_products": summary["total_products"],
+                "low_stock_items": summary["low_stock_items"]
             }
         }
         
@@ -212,34 +536,27 @@ def generate_inventory_report(farmer_id: str = None):
         return {"success": False, "message": f"Failed to generate inventory report: {e}"}
 
 
+FORECAST_HISTORY_DAYS = 56  # 8 weeks, enough for weekly seasonality
+
+
 @app.task(name="predict_demand")
 def predict_demand(product_id: str, days_ahead: int = 7):
     """
     Predict future demand based on historical sales data.
     """
     try:
-        # Get historical sales data from Redis
-        sales_key = f"sales_history:{product_id}"
-        sales_data = redis_client.lrange(sales_key, 0, -1)
+        # Daily units sold over the forecast window, from the sales rollups
+        end_date = datetime.utcnow().date()
+        start_date = end_date - timedelta(days=FORECAST_HISTORY_DAYS - 1)
+        daily_sales = salesRollups.load_daily("product", [product_id], start_date, FORECAST_HISTORY_DAYS, metrics=("q",))["q"][0]
+        sale_days = np.flatnonzero(daily_sales)
         
-        if not sales_data:
+        if not len(sale_days):
             return {"success": False, "message": "No historical sales data available"}
         
-        # Parse sales data
-        daily_sales = {}
-        for sale_str in sales_data:
-            sale = json.loads(sale_str)
-            date = sale.get("date")
-            quantity = sale.get("quantity", 0)
-            
-            if date in daily_sales:
-                daily_sales[date] += quantity
-            else:
-                daily_sales[date] = quantity
-        
-        # Simple prediction: average of last 7 days
-        recent_sales = list(daily_sales.values())[-7:] if len(daily_sales) >= 7 else list(daily_sales.values())
-        avg_daily_sales = sum(recent_sales) / len(recent_sales) if recent_sales else 0
+        # Simple prediction: average of the 7 most recent sale days
+        recent_sales = daily_sales[sale_days[-7:]]
+        avg_daily_sales = float(recent_sales.mean())
         
         predicted_demand = avg_daily_sales * days_ahead
         
@@ -248,7 +565,7 @@ def predict_demand(product_id: str, days_ahead: int = 7):
             "days_ahead": days_ahead,
             "predicted_demand": predicted_demand,
             "avg_daily_sales": avg_daily_sales,
-            "historical_days": len(daily_sales),
+            "historical_days": len(sale_days),
             "generated_at": datetime.utcnow().isoformat()
         }
         
@@ -262,4 +579,137 @@ def predict_demand(product_id: str, days_ahead: int = 7):
         }
         
     except Exception as e:
-        return {"success": False, "message": f"Failed to predict demand: {e}"}
\ No newline at end of file
+        return {"success": False, "message": f"Failed to predict demand: {e}"}
+
+
+FORECAST_METHODS = ("moving_average", "exponential_smoothing")
+
+
+def _load_sales_matrix(product_ids: list, end_date, history_days: int):
+    """
+    Load daily units sold from the product sales rollups into a products x
+    days matrix ending at end_date. Also returns each product's first day
+    with sales (-1 if none) and its number of distinct sale days in the window.
+    """
+    start_date = end_date - timedelta(days=history_days - 1)
+    sales = salesRollups.load_daily("product", product_ids, start_date, history_days, metrics=("q",))["q"]
+    
+    has_sales = sales > 0
+    first_day = np.where(has_sales.any(axis=1), has_sales.argmax(axis=1), -1)
+    return sales, first_day, has_sales.sum(axis=1)
+
+
+def _forecast_moving_average(sales, first_day, days_ahead: int, window: int = 7):
+    """
+    Mean daily sales over the last `window` days, counting days without sales
+    but not days before the product's first sale.
+    """
+    history_days = sales.shape[1]
+    recent = sales[:, -window:].sum(axis=1)
+    observed_days = np.clip(history_days - first_day, 1, window)
+    daily_rate = np.where(first_day >= 0, recent / observed_days, 0.0)
+    return np.repeat(daily_rate[:, None], days_ahead, axis=1), daily_rate
+
+
+def _forecast_exponential_smoothing(sales, first_day, end_date, days_ahead: int, alpha: float = 0.3):
+    """
+    Simple exponential smoothing on deseasonalized sales with multiplicative
+    weekly seasonality. Smoothing runs over the day axis and is vectorized
+    across products; each product starts at its first sale day.
+    """
+    products, history_days = sales.shape
+    day_index = np.arange(history_days)
+    active = day_index[None, :] >= np.where(first_day >= 0, first_day, history_days)[:, None]
+    start_weekday = (end_date - timedelta(days=history_days - 1)).weekday()
+    weekdays = (start_weekday + day_index) % 7
+    
+    # Weekday index = mean sales on that weekday / overall mean, over active days
+    active_sales = np.where(active, sales, 0.0)
+    overall_mean = active_sales.sum(axis=1) / np.maximum(active.sum(axis=1), 1)
+    seasonal = np.ones((products, 7))
+    for weekday in range(7):
+        columns = weekdays == weekday
+        counts = active[:, columns].sum(axis=1)
+        weekday_mean = active_sales[:, columns].sum(axis=1) / np.maximum(counts, 1)
+        # Need at least two observations of a weekday before trusting its index
+        seasonal[:, weekday] = np.where((counts >= 2) & (overall_mean > 0),
+                                        weekday_mean / np.where(overall_mean > 0, overall_mean, 1), 1.0)
+    
+    season_by_day = seasonal[:, weekdays]
+    deseasonalized = np.divide(sales, season_by_day, out=np.zeros_like(sales), where=season_by_day > 0)
+    
+    level = np.zeros(products)
+    for day in range(history_days):
+        started = day == first_day
+        smoothed = alpha * deseasonalized[:, day] + (1 - alpha) * level
+        level = np.where(started, deseasonalized[:, day], np.where(active[:, day], smoothed, level))
+    
+    future_weekdays = (end_date.weekday() + 1 + np.arange(days_ahead)) % 7
+    daily_forecast = level[:, None] * seasonal[:, future_weekdays]
+    return daily_forecast, level
+
+
+@app.task(name="predict_demand_batch")
+def predict_demand_batch(product_ids: list = None, days_ahead: int = 7, method: str = "moving_average",
+                         history_days: int = FORECAST_HISTORY_DAYS, alpha: float = 0.3):
+    """
+    Forecast demand for many products in one task.
+
+    Loads daily sales rollups for the given products (or every product with
+    rollups) into a products x days matrix and forecasts with NumPy:
+      - moving_average: mean of the last 7 days
+      - exponential_smoothing: smoothed level with weekly seasonality
+    Every demand_prediction:{product_id}:{days_ahead} key is written in one
+    pipeline, with the same fields as predict_demand plus the method and
+    per-day forecast.
+    """
+    try:
+        if method not in FORECAST_METHODS:
+            return {"success": False, "message": f"Unknown forecast method: {method}"}
+        
+        if product_ids is None:
+            product_ids = salesRollups.rollup_ids("product")
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {"success": False, "message": "No historical sales data available"}
+        
+        now = datetime.utcnow()
+        end_date = now.date()
+        sales, first_day, sale_days = _load_sales_matrix(product_ids, end_date, history_days)
+        
+        if method == "moving_average":
+            daily_forecast, avg_daily_sales = _forecast_moving_average(sales, first_day, days_ahead)
+        else:
+            daily_forecast, avg_daily_sales = _forecast_exponential_smoothing(sales, first_day, end_date, days_ahead, alpha)
+        predicted_demand = daily_forecast.sum(axis=1)
+        
+        generated_at = now.isoformat()
+        forecasted = 0
+        with redis_manager.pipeline(INVENTORY_DB) as pipe:
+            for row, product_id in enumerate(product_ids):
+                if first_day[row] < 0:
+                    continue
+                prediction_data = {
+                    "product_id": product_id,
+                    "days_ahead": days_ahead,
+                    "predicted_demand": float(predicted_demand[row]),
+                    "avg_daily_sales": float(avg_daily_sales[row]),
+                    "historical_days": int(sale_days[row]),
+                    "method": method,
+                    "daily_forecast": [round(float(value), 2) for value in daily_forecast[row]],
+                    "generated_at": generated_at
+                }
+                cache_key = f"demand_prediction:{product_id}:{days_ahead}"
+                pipe.setex(cache_key, 86400, json.dumps(prediction_data))  # Cache for 24 hours
+                forecasted += 1
+            pipe.execute()
+        
+        return {
+            "success": True,
+            "method": method,
+            "products_forecasted": forecasted,
+            "products_without_history": len(product_ids) - forecasted
+        }
+        
+    except Exception as e:
+        return {"success": False, "message": f"Failed to predict demand: {e}"}
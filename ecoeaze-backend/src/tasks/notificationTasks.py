@@ -1,11 +1,15 @@
 # src/tasks/notificationTasks.py
 import os
-import smtplib
+import uuid
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from celery import Celery
 from dotenv import load_dotenv
-import redis
+from src.tasks.celeryConfig import configure_app
+from src.tasks.emailTemplates import render_email, render_part
+from src.tasks.redisPool import redis_manager, NOTIFICATIONS_DB
+from src.tasks.smtpPool import SmtpConnectionPool
 import json
 
 load_dotenv()
@@ -15,37 +19,44 @@ app = Celery(
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
 )
+configure_app(app)
 
-# Initialize Redis client for real-time notifications
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=2,  # Use database 2 for notifications
-    decode_responses=True
-)
+# Shared pooled Redis client for real-time notifications
+redis_client = redis_manager.client(NOTIFICATIONS_DB)
 
-def _send_email_smtp(to_email: str, subject: str, body: str, html_body: str = None) -> bool:
+_smtp_pool = None
+_smtp_pool_config = None
+
+
+def _smtp_config():
     """
-    Basic SMTP email sender.
-    Config via env:
-      SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_FROM
+    SMTP settings from env. Supports either SMTP_* or EMAIL_* names:
+      SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_FROM, SMTP_STARTTLS
     """
-    # Support either SMTP_* or EMAIL_* env var names
     host = os.getenv("SMTP_HOST") or os.getenv("EMAIL_HOST")
     port = int(os.getenv("SMTP_PORT") or os.getenv("EMAIL_PORT") or "587")
     username = os.getenv("SMTP_USER") or os.getenv("EMAIL_USER")
     password = os.getenv("SMTP_PASS") or os.getenv("EMAIL_PASS")
     from_email = os.getenv("SMTP_FROM") or os.getenv("EMAIL_FROM") or username
+    starttls = (os.getenv("SMTP_STARTTLS") or "true").lower() != "false"
+    return host, port, username, password, from_email, starttls
 
-    if not host or not username or not password:
-        # Fallback: just print to console
-        print("SMTP not configured. Printing email to console instead:")
-        print("TO:", to_email)
-        print("SUBJECT:", subject)
-        print("BODY:", body)
-        return False
 
-    # Create message
+def _get_smtp_pool(host: str, port: int, username: str, password: str, starttls: bool) -> SmtpConnectionPool:
+    """
+    Per-worker SMTP session pool, rebuilt if the settings change.
+    """
+    global _smtp_pool, _smtp_pool_config
+    config = (host, port, username, password, starttls)
+    if _smtp_pool is None or _smtp_pool_config != config:
+        if _smtp_pool is not None:
+            _smtp_pool.close_all()
+        _smtp_pool = SmtpConnectionPool(host, port, username, password, starttls=starttls)
+        _smtp_pool_config = config
+    return _smtp_pool
+
+
+def _build_message(from_email: str, to_email: str, subject: str, body: str, html_body: str = None):
     if html_body:
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
@@ -63,16 +74,42 @@ def _send_email_smtp(to_email: str, subject: str, body: str, html_body: str = No
         msg["Subject"] = subject
         msg["From"] = from_email
         msg["To"] = to_email
+    return msg
+
+
+def _send_emails_smtp(emails: list) -> list:
+    """
+    Send several emails over one pooled SMTP session.
+    Each email is a dict with to, subject, body and optional html_body.
+    Returns a success flag per email.
+    """
+    host, port, username, password, from_email, starttls = _smtp_config()
 
+    if not host or not username or not password:
+        # Fallback: just print to console
+        print("SMTP not configured. Printing email to console instead:")
+        for email in emails:
+            print("TO:", email["to"])
+            print("SUBJECT:", email["subject"])
+            print("BODY:", email["body"])
+        return [False] * len(emails)
+
+    messages = [
+        _build_message(from_email, email["to"], email["subject"], email["body"], email.get("html_body"))
+        for email in emails
+    ]
     try:
-        with smtplib.SMTP(host, port) as server:
-            server.starttls()
-            server.login(username, password)
-            server.send_message(msg)
-        return True
+        return _get_smtp_pool(host, port, username, password, starttls).send_many(messages)
     except Exception as e:
         print(f"Failed to send email: {e}")
-        return False
+        return [False] * len(emails)
+
+
+def _send_email_smtp(to_email: str, subject: str, body: str, html_body: str = None) -> bool:
+    """
+    Basic SMTP email sender, reusing a pooled authenticated session.
+    """
+    return _send_emails_smtp([{"to": to_email, "subject": subject, "body": body, "html_body": html_body}])[0]
 
 
 @app.task(name="send_email")
@@ -85,6 +122,20 @@ def send_email(to: str, subject: str, body: str, html_body: str = None):
     return {"success": success, "to": to, "subject": subject}
 
 
+@app.task(name="send_email_batch")
+def send_email_batch(emails: list):
+    """
+    Send a batch of emails over a single SMTP session.
+    Each email is a dict with to, subject, body and optional html_body.
+    """
+    results = _send_emails_smtp(emails)
+    return {
+        "success": all(results),
+        "sent": sum(results),
+        "failed": [email["to"] for email, sent in zip(emails, results) if not sent]
+    }
+
+
 @app.task(name="send_sms")
 def send_sms(phone_number: str, message: str):
     """
@@ -95,94 +146,217 @@ def send_sms(phone_number: str, message: str):
     return {"success": True, "phone": phone_number}
 
 
-@app.task(name="send_push_notification")
-def send_push_notification(user_id: str, title: str, message: str, data: dict = None):
-    """
-    Send push notification to user via Redis pub/sub for real-time delivery.
-    """
-    notification = {
+NOTIFICATION_HISTORY_LIMIT = 100  # Keep only last 100 notifications
+NOTIFICATION_TTL_SECONDS = 30 * 24 * 60 * 60  # Expire after 30 days
+BULK_NOTIFICATION_CHUNK_SIZE = int(os.getenv("BULK_NOTIFICATION_CHUNK_SIZE", 1000))
+BULK_PROGRESS_TTL_SECONDS = 24 * 60 * 60
+
+
+def _build_notification(user_id: str, title: str, message: str, data: dict = None, timestamp: str = None) -> dict:
+    return {
         "user_id": user_id,
         "title": title,
         "message": message,
         "data": data or {},
-        "timestamp": __import__('datetime').datetime.utcnow().isoformat()
+        "timestamp": timestamp or datetime.utcnow().isoformat()
     }
+
+
+# --- Notification inbox -------------------------------------------------------
+#
+# Each user's inbox is four keys in the notifications db:
+#   user:{id}:inbox         ZSET  notification id -> id (newest = highest)
+#   user:{id}:inbox:items   HASH  notification id -> JSON payload (includes "id")
+#   user:{id}:inbox:unread  SET   unread notification ids
+#   user:{id}:inbox:seq     STRING per-user id counter
+# Writes and reads are Lua scripts, so adding a notification (with trimming,
+# unread tracking, TTL and publish) is atomic and a page read is one round trip.
+
+_INBOX_WRITE_LUA = """
+local id = redis.call('INCR', KEYS[4])
+local payload = '{"id": ' .. id .. ', ' .. string.sub(ARGV[1], 2)
+redis.call('ZADD', KEYS[1], id, id)
+redis.call('HSET', KEYS[2], id, payload)
+redis.call('SADD', KEYS[3], id)
+local overflow = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[2])
+if overflow > 0 then
+    local old = redis.call('ZRANGE', KEYS[1], 0, overflow - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, overflow - 1)
+    redis.call('HDEL', KEYS[2], unpack(old))
+    redis.call('SREM', KEYS[3], unpack(old))
+end
+for i = 1, 4 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+redis.call('PUBLISH', ARGV[4], payload)
+return {id, redis.call('SCARD', KEYS[3])}
+"""
+
+_INBOX_READ_LUA = """
+local ids = redis.call('ZREVRANGEBYSCORE', KEYS[1], ARGV[1], '-inf', 'LIMIT', 0, tonumber(ARGV[2]))
+local out = {redis.call('SCARD', KEYS[3])}
+for _, id in ipairs(ids) do
+    out[#out + 1] = redis.call('HGET', KEYS[2], id) or ''
+    out[#out + 1] = redis.call('SISMEMBER', KEYS[3], id)
+end
+return out
+"""
+
+_inbox_write = redis_client.register_script(_INBOX_WRITE_LUA)
+_inbox_read = redis_client.register_script(_INBOX_READ_LUA)
+
+
+def _inbox_keys(user_id: str) -> list:
+    base = f"user:{user_id}:inbox"
+    return [base, f"{base}:items", f"{base}:unread", f"{base}:seq"]
+
+
+def _queue_push_notification(pipe, user_id: str, notification: dict):
+    """
+    Queue the atomic inbox write + publish for one notification on a pipeline.
+    """
+    _inbox_write(
+        keys=_inbox_keys(user_id),
+        args=[json.dumps(notification), NOTIFICATION_HISTORY_LIMIT, NOTIFICATION_TTL_SECONDS,
+              f"user_notifications:{user_id}"],
+        client=pipe,
+    )
+
+
+def get_inbox(user_id: str, cursor: int = None, limit: int = 20) -> dict:
+    """
+    One page of a user's notifications, newest first, plus the unread count.
+    Pass the returned next_cursor to get the following page; it is None on
+    the last page.
+    """
+    max_score = f"({int(cursor)}" if cursor else "+inf"
+    reply = _inbox_read(keys=_inbox_keys(user_id)[:3], args=[max_score, limit])
     
-    # Publish to Redis channel
-    channel = f"user_notifications:{user_id}"
-    redis_client.publish(channel, json.dumps(notification))
+    notifications = []
+    for payload, unread in zip(reply[1::2], reply[2::2]):
+        if payload:
+            notification = json.loads(payload)
+            notification["read"] = not unread
+            notifications.append(notification)
     
-    # Also store in user's notification list in Redis
-    user_notifications_key = f"user:{user_id}:notifications"
-    redis_client.lpush(user_notifications_key, json.dumps(notification))
-    # Keep only last 100 notifications
-    redis_client.ltrim(user_notifications_key, 0, 99)
-    # Expire after 30 days
-    redis_client.expire(user_notifications_key, 30 * 24 * 60 * 60)
+    next_cursor = notifications[-1]["id"] if len(reply[1::2]) == limit and notifications else None
+    return {"unread_count": reply[0], "notifications": notifications, "next_cursor": next_cursor}
+
+
+def mark_read(user_id: str, notification_ids: list = None) -> int:
+    """
+    Mark notifications as read (all of them when no ids are given).
+    Returns the remaining unread count.
+    """
+    unread_key = _inbox_keys(user_id)[2]
+    with redis_manager.pipeline(NOTIFICATIONS_DB, transaction=True) as pipe:
+        if notification_ids:
+            pipe.srem(unread_key, *notification_ids)
+        else:
+            pipe.delete(unread_key)
+        pipe.scard(unread_key)
+        return pipe.execute()[-1]
+
+
+@app.task(name="get_notification_inbox")
+def get_notification_inbox(user_id: str, cursor: int = None, limit: int = 20):
+    return {"success": True, "user_id": user_id, **get_inbox(user_id, cursor, limit)}
+
+
+@app.task(name="mark_notifications_read")
+def mark_notifications_read(user_id: str, notification_ids: list = None):
+    return {"success": True, "user_id": user_id, "unread_count": mark_read(user_id, notification_ids)}
+
+
+@app.task(name="send_push_notification")
+def send_push_notification(user_id: str, title: str, message: str, data: dict = None):
+    """
+    Send push notification to user via Redis pub/sub for real-time delivery.
+    """
+    with redis_manager.pipeline(NOTIFICATIONS_DB) as pipe:
+        _queue_push_notification(pipe, user_id, _build_notification(user_id, title, message, data))
+        pipe.execute()
     
     return {"success": True, "user_id": user_id, "title": title}
 
 
-@app.task(name="send_bulk_notification")
-def send_bulk_notification(user_ids: list, title: str, message: str, data: dict = None):
+@app.task(name="deliver_notification_chunk")
+def deliver_notification_chunk(batch_id: str, user_ids: list, title: str, message: str,
+                               data: dict = None, timestamp: str = None):
     """
-    Send notification to multiple users.
+    Deliver one chunk of a bulk notification with a single pipeline and
+    record progress in bulk_notification:{batch_id}.
     """
-    results = []
-    for user_id in user_ids:
-        result = send_push_notification.delay(user_id, title, message, data)
-        results.append(str(result))
+    progress_key = f"bulk_notification:{batch_id}"
+    with redis_manager.pipeline(NOTIFICATIONS_DB) as pipe:
+        for user_id in user_ids:
+            _queue_push_notification(pipe, user_id, _build_notification(user_id, title, message, data, timestamp))
+        pipe.hincrby(progress_key, "delivered", len(user_ids))
+        pipe.hincrby(progress_key, "chunks_done", 1)
+        pipe.expire(progress_key, BULK_PROGRESS_TTL_SECONDS)
+        results = pipe.execute()
     
-    return {"success": True, "results": results}
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "delivered": len(user_ids),
+        "total_delivered": results[-3]
+    }
 
 
-@app.task(name="send_welcome_email")
-def send_welcome_email(user_email: str, user_name: str):
+@app.task(name="send_bulk_notification", bind=True)
+def send_bulk_notification(self, user_ids: list, title: str, message: str, data: dict = None,
+                           chunk_size: int = BULK_NOTIFICATION_CHUNK_SIZE):
     """
-    Send welcome email to new users.
+    Send notification to multiple users.
+
+    user_ids are split into chunks and each chunk is delivered by one
+    deliver_notification_chunk task, so broker traffic grows with the number
+    of chunks rather than users. A single chunk is delivered inline. Progress
+    (total, chunks, delivered, chunks_done) is kept in the
+    bulk_notification:{batch_id} hash for 24 hours.
     """
-    subject = "Welcome to EcoEaze!"
-    
-    body = f"""
-    Hi {user_name},
-    
-    Welcome to EcoEaze! We're excited to have you join our community of sustainable shoppers and farmers.
+    batch_id = self.request.id or uuid.uuid4().hex
+    timestamp = datetime.utcnow().isoformat()
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
     
-    As a {('farmer' if 'farmer' in user_email else 'customer')}, you'll enjoy:
-    - Fresh, organic produce directly from local farms
-    - Competitive pricing with no middlemen
-    - Real-time updates on your orders
+    progress_key = f"bulk_notification:{batch_id}"
+    with redis_manager.pipeline(NOTIFICATIONS_DB) as pipe:
+        pipe.hset(progress_key, mapping={"total": len(user_ids), "chunks": len(chunks), "delivered": 0, "chunks_done": 0})
+        pipe.expire(progress_key, BULK_PROGRESS_TTL_SECONDS)
+        pipe.execute()
     
-    Start exploring our marketplace today!
+    if len(chunks) == 1:
+        deliver_notification_chunk(batch_id, chunks[0], title, message, data, timestamp)
+    else:
+        for chunk in chunks:
+            deliver_notification_chunk.delay(batch_id, chunk, title, message, data, timestamp)
     
-    Best regards,
-    The EcoEaze Team
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "progress_key": progress_key,
+        "total": len(user_ids),
+        "chunks": len(chunks)
+    }
+
+
+def _send_rendered_email(template_name: str, to: str, /, **context):
     """
-    
-    html_body = f"""
-    <html>
-    <body>
-        <h2>Welcome to EcoEaze!</h2>
-        <p>Hi {user_name},</p>
-        
-        <p>Welcome to EcoEaze! We're excited to have you join our community of sustainable shoppers and farmers.</p>
-        
-        <p>As a {('farmer' if 'farmer' in user_email else 'customer')}, you'll enjoy:</p>
-        <ul>
-            <li>Fresh, organic produce directly from local farms</li>
-            <li>Competitive pricing with no middlemen</li>
-            <li>Real-time updates on your orders</li>
-        </ul>
-        
-        <p>Start exploring our marketplace today!</p>
-        
-        <p>Best regards,<br/>
-        The EcoEaze Team</p>
-    </body>
-    </html>
+    Render a template and send it from the current task, so a templated
+    email costs one queue hop instead of chaining send_email.delay().
     """
-    
-    return send_email.delay(user_email, subject, body, html_body)
+    subject, body, html_body = render_email(template_name, **context)
+    return send_email(to, subject, body, html_body)
+
+
+@app.task(name="send_welcome_email")
+def send_welcome_email(user_email: str, user_name: str):
+    """
+    Send welcome email to new users.
+    """
+    role = "farmer" if "farmer" in user_email else "customer"
+    return _send_rendered_email("welcome", user_email, user_name=user_name, role=role)
 
 
 @app.task(name="send_order_confirmation")
@@ -190,85 +364,27 @@ def send_order_confirmation(user_email: str, user_name: str, order_id: str, item
     """
     Send order confirmation email.
     """
-    subject = f"Order Confirmation - #{order_id}"
-    
-    items_list = "\n".join([f"- {item['name']} x {item['quantity']} @ ₹{item['price']}" for item in items])
+    items_text = "\n".join(render_part("order_item", "body", **item) for item in items)
+    items_html = "".join(render_part("order_item", "html_body", **item) for item in items)
     
-    body = f"""
-    Hi {user_name},
-    
-    Thank you for your order! Here are the details:
-    
-    Order ID: {order_id}
-    
-    Items:
-    {items_list}
-    
-    Total Amount: ₹{total_amount:.2f}
-    
-    Your order is being processed and will be shipped soon. We'll notify you when it's on its way.
-    
-    Best regards,
-    The EcoEaze Team
-    """
-    
-    html_body = f"""
-    <html>
-    <body>
-        <h2>Order Confirmation</h2>
-        <p>Hi {user_name},</p>
-        
-        <p>Thank you for your order! Here are the details:</p>
-        
-        <p><strong>Order ID:</strong> {order_id}</p>
-        
-        <h3>Items:</h3>
-        <ul>
-        {''.join([f"<li>{item['name']} x {item['quantity']} @ ₹{item['price']}</li>" for item in items])}
-        </ul>
-        
-        <p><strong>Total Amount:</strong> ₹{total_amount:.2f}</p>
-        
-        <p>Your order is being processed and will be shipped soon. We'll notify you when it's on its way.</p>
-        
-        <p>Best regards,<br/>
-        The EcoEaze Team</p>
-    </body>
-    </html>
-    """
-    
-    return send_email.delay(user_email, subject, body, html_body)
+    return _send_rendered_email(
+        "order_confirmation",
+        user_email,
+        user_name=user_name,
+        order_id=order_id,
+        items=items_text,
+        items_html=items_html,
+        total_amount=f"{total_amount:.2f}",
+    )
 
 
 @app.task(name="send_otp_email")
 def send_otp_email(user_email: str, code: str, expires_minutes: int = 5):
-        """
-        Send an OTP email to the user. This task wraps `send_email`.
-        Arguments:
-            user_email: recipient email
-            code: OTP code (string)
-            expires_minutes: expiry in minutes (default 5)
-        """
-        subject = "Your EcoEaze verification code"
-        body = f"""
-Hi,
-
-Your EcoEaze verification code is: {code}
-
-This code will expire in {expires_minutes} minutes. If you did not request this, please ignore this email.
-
-Best,
-EcoEaze Team
-"""
-        html_body = f"""
-<html>
-<body>
-    <p>Hi,</p>
-    <p>Your EcoEaze verification code is: <strong>{code}</strong></p>
-    <p>This code will expire in {expires_minutes} minutes. If you did not request this, please ignore this email.</p>
-    <p>Best,<br/>EcoEaze Team</p>
-</body>
-</html>
-"""
-
-        return send_email.delay(user_email, subject, body, html_body)
\ No newline at end of file
+    """
+    Send an OTP email to the user, rendered and sent inline.
+    Arguments:
+        user_email: recipient email
+        code: OTP code (string)
+        expires_minutes: expiry in minutes (default 5)
+    """
+    return _send_rendered_email("otp", user_email, code=code, expires_minutes=expires_minutes)
@@ -0,0 +1,126 @@
+# src/tasks/redisPool.py
+import os
+import threading
+from dotenv import load_dotenv
+import redis
+
+load_dotenv()
+
+# Logical Redis databases used by the task modules
+NOTIFICATIONS_DB = 2
+ANALYTICS_DB = 3
+INVENTORY_DB = 4
+IMAGES_DB = 5
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD") or None
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+
+
+class RedisConnectionManager:
+    """
+    Serves one Redis client per logical database, each backed by a bounded
+    blocking connection pool.
+
+    Clients are created lazily and shared by every task module in the worker
+    process. After a fork (Celery prefork pool) the pools are reset in place so
+    the child never reuses sockets inherited from the parent, while module-level
+    client references stay valid.
+    """
+
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, password: str = None,
+                 max_connections: int = REDIS_MAX_CONNECTIONS):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._clients = {}
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self.reset()
+
+    def reset(self):
+        """
+        Drop connections inherited from a parent process without closing them.
+        Runs in the forked child, so the lock is replaced rather than acquired.
+        """
+        self._lock = threading.Lock()
+        for pool in list(self._pools.values()):
+            pool.reset()
+        self._pid = os.getpid()
+
+    def pool(self, db: int) -> redis.BlockingConnectionPool:
+        self._check_pid()
+        pool = self._pools.get(db)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(db)
+                if pool is None:
+                    pool = redis.BlockingConnectionPool(
+                        host=self.host,
+                        port=self.port,
+                        password=self.password,
+                        db=db,
+                        max_connections=self.max_connections,
+                        timeout=REDIS_POOL_TIMEOUT,
+                        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                        socket_keepalive=True,
+                        retry_on_timeout=True,
+                        decode_responses=True,
+                    )
+                    self._pools[db] = pool
+        return pool
+
+    def client(self, db: int) -> redis.Redis:
+        """
+        Get the shared client for a logical database.
+        """
+        client = self._clients.get(db)
+        if client is None:
+            pool = self.pool(db)
+            with self._lock:
+                client = self._clients.setdefault(db, redis.Redis(connection_pool=pool))
+        else:
+            self._check_pid()
+        return client
+
+    def pipeline(self, db: int, transaction: bool = False):
+        """
+        Pipeline on the shared client. Buffered commands are sent in a single
+        round trip on execute(); with transaction=True they are wrapped in
+        MULTI/EXEC.
+
+            with redis_manager.pipeline(ANALYTICS_DB) as pipe:
+                pipe.zadd(key, mapping)
+                pipe.expire(key, ttl)
+                pipe.execute()
+        """
+        return self.client(db).pipeline(transaction=transaction)
+
+    def transaction(self, db: int, func, *watches, **kwargs):
+        """
+        Run func(pipe) under WATCH on the given keys and retry on conflict.
+        """
+        return self.client(db).transaction(func, *watches, **kwargs)
+
+    def disconnect(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.disconnect()
+
+
+redis_manager = RedisConnectionManager(password=REDIS_PASSWORD)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=redis_manager.reset)
+
+
+def get_redis(db: int) -> redis.Redis:
+    return redis_manager.client(db)
@@ -0,0 +1,277 @@
+# src/tasks/salesRollups.py
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from dotenv import load_dotenv
+from src.tasks.redisPool import redis_manager, ANALYTICS_DB
+
+load_dotenv()
+
+# Pre-aggregated sales, written by analyticsTasks.ingest_order_events and read
+# by forecasting, sales and P&L reports. Per product and per farmer:
+#   sales:{kind}:{id}:d:{YYYYMM}    HASH  "{DD}:{metric}"  one hash per month
+#   sales:{kind}:{id}:h:{YYYYMMDD}  HASH  "{HH}:{metric}"  one hash per day
+# with kind "product" or "farmer" and metrics
+#   q  units sold
+#   r  revenue in cents
+#   o  orders (containing the product / one of the farmer's products)
+# Each hash stays under ~100 small fields, so Redis keeps it listpack-encoded.
+# q is always written with HINCRBYFLOAT (quantities can be fractional, and
+# HINCRBY fails on a field holding a float); r and o with HINCRBY.
+# sales:products / sales:farmers index every id with rollups, and
+# sales:order:{order_id} marks orders already counted so redelivered events
+# aren't counted twice. An order's claim and its increments are applied by
+# one script, so a failed write can't leave an order claimed but uncounted.
+# A claim lives until the order's day drops out of the daily rollups
+# (createdAt + DAILY_TTL_SECONDS); orders older than that are rejected, since
+# their claim may be gone and counting them again would double them. When a
+# cancelled order comes in, the same script takes back its increments if it
+# was counted and sets the claim to "cancelled", so it is never counted again.
+# sales:backfilled:{kind}s records ids whose history has been backfilled.
+SALES_DB = ANALYTICS_DB
+METRICS = ("q", "r", "o")
+DAILY_TTL_SECONDS = int(os.getenv("SALES_DAILY_ROLLUP_TTL", 400 * 86400))
+HOURLY_TTL_SECONDS = int(os.getenv("SALES_HOURLY_ROLLUP_TTL", 35 * 86400))
+# Longest window the daily rollups cover, and so the furthest back orders
+# can be ingested or backfilled
+ROLLUP_HORIZON_DAYS = DAILY_TTL_SECONDS // 86400
+ROLLUP_LOAD_BATCH_SIZE = 500
+
+redis_client = redis_manager.client(SALES_DB)
+
+_INGEST_ORDER_LUA = """
+local cancel = ARGV[2] == '-1'
+if cancel then
+    if KEYS[1] == '' then
+        return 0
+    end
+    local state = redis.call('GET', KEYS[1])
+    redis.call('SET', KEYS[1], 'cancelled', 'EX', ARGV[1])
+    if state ~= '1' then
+        return 0
+    end
+elseif KEYS[1] ~= '' and not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+local arg = 3
+for i = 2, #KEYS do
+    local ttl, index, entity_id, count = ARGV[arg], ARGV[arg + 1], ARGV[arg + 2], tonumber(ARGV[arg + 3])
+    arg = arg + 4
+    -- Taking an order back leaves rollups that have already expired alone
+    if not cancel or redis.call('EXISTS', KEYS[i]) == 1 then
+        for n = arg, arg + 2 * count - 1, 2 do
+            local field, amount = ARGV[n], ARGV[n + 1]
+            if cancel then
+                amount = '-' .. amount
+            end
+            if string.sub(field, -2) == ':q' then
+                redis.call('HINCRBYFLOAT', KEYS[i], field, amount)
+            else
+                redis.call('HINCRBY', KEYS[i], field, amount)
+            end
+        end
+        redis.call('EXPIRE', KEYS[i], ttl)
+        redis.call('SADD', index, entity_id)
+    end
+    arg = arg + 2 * count
+end
+return cancel and -1 or 1
+"""
+
+_ingest_order = redis_client.register_script(_INGEST_ORDER_LUA)
+
+
+def _ref_id(value):
+    # Line items may carry populated documents instead of ids
+    if isinstance(value, dict):
+        value = value.get("_id") or value.get("id")
+    return str(value) if value else None
+
+
+def _order_time(order: dict) -> datetime:
+    created = order.get("createdAt") or order.get("created_at")
+    if not created:
+        return datetime.utcnow()
+    if isinstance(created, (int, float)):
+        return datetime.utcfromtimestamp(created)
+    created = datetime.fromisoformat(created.replace("Z", "+00:00"))
+    if created.tzinfo is not None:
+        created = created.astimezone(timezone.utc).replace(tzinfo=None)
+    return created
+
+
+def order_id(order: dict):
+    return _ref_id(order.get("_id") or order.get("id"))
+
+
+def daily_key(kind: str, entity_id: str, month: str) -> str:
+    return f"sales:{kind}:{entity_id}:d:{month}"
+
+
+def hourly_key(kind: str, entity_id: str, day: str) -> str:
+    return f"sales:{kind}:{entity_id}:h:{day}"
+
+
+def aggregate_orders(orders) -> dict:
+    """
+    Sum line items into {(key, field): amount} increments for the daily and
+    hourly product/farmer hashes.
+    """
+    increments = defaultdict(float)
+    for order in orders:
+        created = _order_time(order)
+        month, day = created.strftime("%Y%m"), created.strftime("%Y%m%d")
+        day_field, hour_field = created.strftime("%d"), created.strftime("%H")
+        counted = set()
+
+        for item in order.get("items", []):
+            quantity = item.get("quantity", 0) or 0
+            revenue_cents = round((item.get("price", 0) or 0) * quantity * 100)
+            for kind, entity_id in (("product", _ref_id(item.get("product"))),
+                                    ("farmer", _ref_id(item.get("farmer")))):
+                if not entity_id:
+                    continue
+                first = (kind, entity_id) not in counted
+                counted.add((kind, entity_id))
+                for key, field in ((daily_key(kind, entity_id, month), day_field),
+                                   (hourly_key(kind, entity_id, day), hour_field)):
+                    increments[key, f"{field}:q"] += quantity
+                    increments[key, f"{field}:r"] += revenue_cents
+                    if first:
+                        increments[key, f"{field}:o"] += 1
+    return increments
+
+
+def _claim_ttl(order: dict, now: float = None) -> int:
+    """
+    Seconds the order's claim must live: until its createdAt falls outside
+    the daily rollups. Zero or less for orders too old to ingest.
+    """
+    created = _order_time(order).replace(tzinfo=timezone.utc).timestamp()
+    return int(created + DAILY_TTL_SECONDS - (time.time() if now is None else now))
+
+
+def queue_order_ingest(pipe, order: dict, now: float = None) -> bool:
+    """
+    Queue one order's claim and rollup increments on a pipeline as a single
+    script call. Its reply is 1 if the order was counted, 0 if it had been
+    already. A cancelled order's increments are taken back instead: the reply
+    is -1 if it had been counted, 0 if not. Orders without an id are counted
+    unconditionally (and can't be taken back). Returns False, queuing
+    nothing, for orders older than the daily rollups' horizon.
+    """
+    claim_ttl = _claim_ttl(order, now)
+    if claim_ttl <= 0:
+        return False
+
+    by_key = defaultdict(list)
+    for (key, field), amount in aggregate_orders([order]).items():
+        # r and o are always whole; q is sent as an int when it is one too
+        by_key[key] += [field, int(amount) if float(amount).is_integer() else amount]
+
+    claim = order_id(order)
+    sign = -1 if order.get("status") == "cancelled" else 1
+    keys, args = [f"sales:order:{claim}" if claim else ""], [claim_ttl, sign]
+    for key, fields in by_key.items():
+        prefix, granularity, _ = key.rsplit(":", 2)
+        _, kind, entity_id = prefix.split(":", 2)
+        keys.append(key)
+        args += [DAILY_TTL_SECONDS if granularity == "d" else HOURLY_TTL_SECONDS,
+                 f"sales:{kind}s", entity_id, len(fields) // 2, *fields]
+    _ingest_order(keys=keys, args=args, client=pipe)
+    return True
+
+
+def load_daily(kind: str, entity_ids: list, start_date, days: int, metrics=METRICS) -> dict:
+    """
+    Daily rollups for entity_ids over `days` days from start_date, as
+    {metric: array of shape (len(entity_ids), days)}. One HMGET per entity
+    and month, pipelined in batches.
+    """
+    dates = [start_date + timedelta(days=n) for n in range(days)]
+    months = defaultdict(list)
+    for column, date in enumerate(dates):
+        months[date.strftime("%Y%m")].append((column, date.strftime("%d")))
+
+    series = {metric: np.zeros((len(entity_ids), days)) for metric in metrics}
+    for start in range(0, len(entity_ids), ROLLUP_LOAD_BATCH_SIZE):
+        batch = entity_ids[start:start + ROLLUP_LOAD_BATCH_SIZE]
+        with redis_manager.pipeline(SALES_DB) as pipe:
+            for entity_id in batch:
+                for month, columns in months.items():
+                    fields = [f"{day}:{metric}" for _, day in columns for metric in metrics]
+                    pipe.hmget(daily_key(kind, entity_id, month), fields)
+            replies = iter(pipe.execute())
+
+        for row, _ in enumerate(batch, start=start):
+            for month, columns in months.items():
+                values = iter(next(replies))
+                for column, _ in columns:
+                    for metric in metrics:
+                        value = next(values)
+                        if value is not None:
+                            series[metric][row, column] = float(value)
+    return series
+
+
+def load_hourly(kind: str, entity_id: str, start: datetime, hours: int, metrics=METRICS) -> dict:
+    """
+    Hourly rollups for one entity over `hours` hours from start (truncated to
+    the hour), as {metric: list of length hours}.
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+    slots = [start + timedelta(hours=n) for n in range(hours)]
+    days = defaultdict(list)
+    for column, slot in enumerate(slots):
+        days[slot.strftime("%Y%m%d")].append((column, slot.strftime("%H")))
+
+    with redis_manager.pipeline(SALES_DB) as pipe:
+        for day, columns in days.items():
+            pipe.hmget(hourly_key(kind, entity_id, day), [f"{hour}:{metric}" for _, hour in columns for metric in metrics])
+        replies = pipe.execute()
+
+    series = {metric: [0.0] * hours for metric in metrics}
+    for (day, columns), reply in zip(days.items(), replies):
+        values = iter(reply)
+        for column, _ in columns:
+            for metric in metrics:
+                value = next(values)
+                if value is not None:
+                    series[metric][column] = float(value)
+    return series
+
+
+def sales_summary(kind: str, entity_id: str, start_date, days: int) -> dict:
+    """
+    Totals and the per-day series for one product or farmer.
+    """
+    series = load_daily(kind, [entity_id], start_date, days)
+    quantity, revenue_cents, orders = (series[metric][0] for metric in METRICS)
+    return {
+        "units_sold": float(quantity.sum()),
+        "revenue": float(revenue_cents.sum()) / 100,
+        "order_count": int(orders.sum()),
+        "daily": [
+            {
+                "date": (start_date + timedelta(days=n)).isoformat(),
+                "units_sold": float(quantity[n]),
+                "revenue": float(revenue_cents[n]) / 100,
+                "orders": int(orders[n])
+            }
+            for n in range(days)
+        ]
+    }
+
+
+def rollup_ids(kind: str) -> list:
+    return list(redis_client.smembers(f"sales:{kind}s"))
+
+
+def is_backfilled(kind: str, entity_id: str) -> bool:
+    return bool(redis_client.sismember(f"sales:backfilled:{kind}s", entity_id))
+
+
+def mark_backfilled(kind: str, entity_id: str):
+    redis_client.sadd(f"sales:backfilled:{kind}s", entity_id)
@@ -0,0 +1,157 @@
+# src/tasks/smtpPool.py
+import os
+import smtplib
+import threading
+import time
+
+SMTP_MAX_IDLE = int(os.getenv("SMTP_MAX_IDLE", 4))
+# Most servers drop idle sessions after a few minutes; recycle ours before that
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+# The server refused this message only; the session is still usable
+_REJECTED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _is_connection_error(error: OSError) -> bool:
+    """
+    True if the session can't be reused after this error: the server hung up
+    or the socket failed. SMTPException subclasses OSError, so the other SMTP
+    errors (refused handshake/login, unexpected replies) have to be excluded.
+    """
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+class SmtpConnectionPool:
+    """
+    Per-worker pool of authenticated SMTP sessions.
+
+    Connecting, STARTTLS and AUTH happen once per session instead of once per
+    email. Idle sessions older than idle_timeout are closed instead of reused,
+    and a send that fails because the server dropped the connection is retried
+    once on a fresh session. A forked child discards sessions inherited from
+    its parent.
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str, starttls: bool = True,
+                 max_idle: int = SMTP_MAX_IDLE, idle_timeout: float = SMTP_IDLE_TIMEOUT,
+                 timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = []  # (session, last_used) pairs, most recent last
+        self._pid = os.getpid()
+        self.stats = {"connections": 0, "reused": 0, "reconnects": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.stats["connections"] += 1
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _acquire(self) -> smtplib.SMTP:
+        if self._pid != os.getpid():
+            # Sockets belong to the parent; drop them without QUIT
+            self._lock = threading.Lock()
+            self._idle = []
+            self._pid = os.getpid()
+
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.idle_timeout:
+                self.stats["reused"] += 1
+                return server
+            self._close(server)
+        return self._connect()
+
+    def _release(self, server: smtplib.SMTP):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((server, time.monotonic()))
+                return
+        self._close(server)
+
+    def send_many(self, messages: list) -> list:
+        """
+        Send email.message.Message objects over one session.
+        Returns a success flag per message.
+        """
+        results = []
+        server = None
+        try:
+            for index, msg in enumerate(messages):
+                for attempt in range(2):
+                    try:
+                        if server is None:
+                            server = self._acquire()
+                        server.send_message(msg)
+                        results.append(True)
+                        break
+                    except _REJECTED_ERRORS as e:
+                        # Bad recipient/sender or refused content; the session is still usable
+                        print(f"Failed to send email: {e}")
+                        results.append(False)
+                        break
+                    except OSError as e:
+                        if not _is_connection_error(e):
+                            print(f"Failed to send email: {e}")
+                            if server is None:
+                                # Login/handshake refused; every other message would fail the same way
+                                return results + [False] * (len(messages) - index)
+                            results.append(False)
+                            break
+
+                        connected = server is not None
+                        if connected:
+                            server.close()
+                            server = None
+                        if attempt == 0:
+                            self.stats["reconnects"] += 1
+                            continue
+                        print(f"Failed to send email: {e}")
+                        if not connected:
+                            # Server unreachable; don't retry the rest one by one
+                            return results + [False] * (len(messages) - index)
+                        results.append(False)
+        except BaseException:
+            # Anything else (e.g. a message that can't be encoded) may have
+            # left the session mid-command; don't hand it to the next sender
+            if server is not None:
+                server.close()
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self._release(server)
+        return results
+
+    def send(self, msg) -> bool:
+        return self.send_many([msg])[0]
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
@@ -2,9 +2,15 @@
 echo Starting Celery Workers for EcoEaze Backend
 echo ==========================================
 
-REM Start the main Celery worker
-echo Starting main Celery worker...
-start "Celery Worker" cmd /k "cd /d %~dp0 && python celery/celery_worker.py"
+REM Start one worker per queue: CPU-bound (prefork) and one per I/O priority lane (threads)
+echo Starting CPU Celery worker...
+start "Celery CPU Worker" cmd /k "cd /d %~dp0 && python celery/celery_worker.py cpu"
+echo Starting transactional Celery worker...
+start "Celery Transactional Worker" cmd /k "cd /d %~dp0 && python celery/celery_worker.py transactional"
+echo Starting interactive Celery worker...
+start "Celery Interactive Worker" cmd /k "cd /d %~dp0 && python celery/celery_worker.py interactive"
+echo Starting bulk Celery worker...
+start "Celery Bulk Worker" cmd /k "cd /d %~dp0 && python celery/celery_worker.py bulk"
 
 REM Start Celery Beat for periodic tasks (optional)
 echo Starting Celery Beat scheduler...
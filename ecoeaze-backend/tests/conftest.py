@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Import the task modules as src.tasks.* from the backend root, as the workers do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,117 @@
+# tests/test_http_client.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from src.tasks import analyticsTasks
+from src.tasks.httpClient import HttpClient
+
+TOKEN = "service-token"
+ORDERS = [{"_id": f"order{n}", "farmerId": "farmer1", "items": []} for n in range(25)]
+STATS = {"success": True, "data": {"totalUsers": 3}}
+
+
+class StubApi(BaseHTTPRequestHandler):
+    """
+    /farmers/orders paginated like the Node API, /admin/stats with an ETag.
+    Both answer 401 without the service token.
+    """
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        StubApi.requests_seen.append((url.path, query, dict(self.headers)))
+
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            self._send(401, {"success": False, "message": "Not authenticated. Token missing."})
+        elif url.path == "/api/farmers/orders":
+            limit, page = int(query["limit"]), int(query["page"])
+            matching = [order for order in ORDERS if order["farmerId"] == query.get("farmerId")]
+            self._send(200, {
+                "success": True,
+                "data": matching[(page - 1) * limit:page * limit],
+                "pagination": {"total": len(matching), "page": page, "limit": limit},
+            })
+        elif url.path == "/api/admin/stats":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304)
+            else:
+                self._send(200, STATS, {"ETag": '"v1"', "Content-Type": "application/json"})
+        else:
+            self._send(404, {"success": False})
+
+
+@pytest.fixture
+def api_base():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubApi.requests_seen = []
+    yield f"http://127.0.0.1:{server.server_address[1]}/api"
+    server.shutdown()
+    server.server_close()
+
+
+def test_farmer_orders_are_fetched_page_by_page_with_the_service_token(api_base, monkeypatch):
+    monkeypatch.setattr(analyticsTasks, "analytics_api", HttpClient(api_base, token=TOKEN))
+
+    orders = list(analyticsTasks._iter_farmer_orders("farmer1", page_size=10))
+
+    assert [order["_id"] for order in orders] == [order["_id"] for order in ORDERS]
+    assert [query["page"] for _, query, _ in StubApi.requests_seen] == ["1", "2", "3"]
+    assert all(query["farmerId"] == "farmer1" and query["limit"] == "10" for _, query, _ in StubApi.requests_seen)
+    assert all(headers["Authorization"] == f"Bearer {TOKEN}" for _, _, headers in StubApi.requests_seen)
+
+
+def test_cached_response_is_reused_then_revalidated_with_etag(api_base):
+    client = HttpClient(api_base, token=TOKEN)
+
+    assert client.get_json("/admin/stats", cache_ttl=0.2) == STATS
+    assert client.get_json("/admin/stats", cache_ttl=0.2) == STATS
+    assert len(StubApi.requests_seen) == 1
+
+    time.sleep(0.3)
+    assert client.get_json("/admin/stats", cache_ttl=0.2) == STATS
+    assert len(StubApi.requests_seen) == 2
+    assert StubApi.requests_seen[1][2]["If-None-Match"] == '"v1"'
+    assert client.stats == {"hits": 1, "revalidated": 1, "misses": 1}
+
+
+def test_missing_token_raises_401_without_retrying_or_caching(api_base):
+    client = HttpClient(api_base)
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError) as error:
+            client.get_json("/admin/stats", cache_ttl=60)
+        assert error.value.response.status_code == 401
+
+    assert len(StubApi.requests_seen) == 2
+    assert "Authorization" not in StubApi.requests_seen[0][2]
+    assert client.stats["misses"] == 0
+
+
+def test_report_fails_cleanly_when_the_api_rejects_the_worker(api_base, monkeypatch):
+    monkeypatch.setattr(analyticsTasks, "analytics_api", HttpClient(api_base, token="wrong"))
+
+    result = analyticsTasks.generate_profit_loss_report("farmer1", period="all")
+
+    assert result["success"] is False
+    assert "401" in result["message"]
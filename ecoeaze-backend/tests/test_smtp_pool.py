@@ -0,0 +1,147 @@
+# tests/test_smtp_pool.py
+import socket
+import warnings
+from email.mime.text import MIMEText
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from src.tasks.smtpPool import SmtpConnectionPool
+
+USERNAME, PASSWORD = "pool-test", "secret"
+
+
+class Handler:
+    def __init__(self):
+        self.delivered = []
+        self.connections = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+class CountingController(Controller):
+    def factory(self):
+        self.handler.connections += 1
+        return super().factory()
+
+    def start(self):
+        # start() opens a probe connection of its own; don't count it
+        super().start()
+        self.handler.connections -= 1
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.login == USERNAME.encode() and auth_data.password == PASSWORD.encode(),
+                      handled=False)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SmtpServer:
+    def __init__(self):
+        self.port = _free_port()
+        self.handler = Handler()
+        self.controller = None
+
+    def start(self):
+        self.controller = CountingController(self.handler, hostname="127.0.0.1", port=self.port,
+                                             auth_require_tls=False, authenticator=authenticate)
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
+
+
+@pytest.fixture
+def smtp_server():
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    server = SmtpServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SmtpConnectionPool("127.0.0.1", smtp_server.port, USERNAME, PASSWORD, starttls=False, timeout=5)
+    yield pool
+    pool.close_all()
+
+
+def message(to: str) -> MIMEText:
+    msg = MIMEText("pool test")
+    msg["Subject"] = "pool test"
+    msg["From"] = "noreply@ecoeaze.test"
+    msg["To"] = to
+    return msg
+
+
+def test_sends_reuse_one_session(smtp_server, pool):
+    results = [pool.send(message(f"single{n}@ecoeaze.test")) for n in range(5)]
+    results += pool.send_many([message(f"batch{n}@ecoeaze.test") for n in range(5)])
+
+    assert results == [True] * 10
+    assert len(smtp_server.handler.delivered) == 10
+    assert smtp_server.handler.connections == 1
+    assert pool.stats == {"connections": 1, "reused": 5, "reconnects": 0}
+
+
+def test_dropped_connection_is_replaced_once(smtp_server, pool):
+    assert pool.send(message("before@ecoeaze.test"))
+    smtp_server.stop()
+    smtp_server.start()
+
+    assert pool.send(message("after@ecoeaze.test"))
+    assert pool.stats["reconnects"] == 1
+    assert smtp_server.handler.delivered == ["before@ecoeaze.test", "after@ecoeaze.test"]
+
+
+def test_rejected_recipient_fails_only_its_message_and_keeps_the_session(smtp_server, pool):
+    results = pool.send_many([message("first@ecoeaze.test"), message("refused@ecoeaze.test"),
+                              message("third@ecoeaze.test")])
+
+    assert results == [True, False, True]
+    assert smtp_server.handler.connections == 1
+    assert pool.stats["reconnects"] == 0
+    assert pool.send(message("later@ecoeaze.test"))
+    assert pool.stats["reused"] == 1
+
+
+def test_unexpected_error_closes_the_session_instead_of_pooling_it(smtp_server, pool):
+    assert pool.send(message("first@ecoeaze.test"))
+    session = pool._idle[0][0]
+    broken = message("broken@ecoeaze.test")
+    # smtplib refuses messages with two Resent- blocks with a ValueError
+    broken["Resent-Date"] = "Mon, 1 Jan 2024 00:00:00 +0000"
+    broken["Resent-Date"] = "Tue, 2 Jan 2024 00:00:00 +0000"
+
+    with pytest.raises(ValueError):
+        pool.send(broken)
+
+    assert pool._idle == []
+    assert session.sock is None
+    assert pool.send(message("after@ecoeaze.test"))
+    assert pool.stats["connections"] == 2
+
+
+def test_refused_login_fails_the_batch_on_one_connection(smtp_server):
+    pool = SmtpConnectionPool("127.0.0.1", smtp_server.port, USERNAME, "wrong", starttls=False, timeout=5)
+
+    assert pool.send_many([message(f"auth{n}@ecoeaze.test") for n in range(3)]) == [False] * 3
+    assert smtp_server.handler.connections == 1
+    assert smtp_server.handler.delivered == []